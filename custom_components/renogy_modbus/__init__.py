@@ -1,19 +1,68 @@
 from __future__ import annotations
 
+import json
 import logging
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers import device_registry as dr
-
-from .const import DOMAIN, DEVICE_TYPES
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    DATA_POOL,
+    DEFAULT_FRAME_GAP_MS,
+    DEFAULT_PIPELINE_DEPTH,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_TTL,
+    DEFAULT_SERIAL_BAUD,
+    DEFAULT_UPDATE_INTERVAL,
+    DEVICE_TYPES,
+)
+from .connection_pool import RenogyConnectionPool
 from .modbus_client import RenogyModbusClient
 from .coordinator import RenogyCoordinator
+from .identity import IdentityStore
+from .trace import trace_as_json, trace_as_pcap
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = ["sensor"]
 
 
+# ================================================================
+#   SERVICE HELPERS
+# ================================================================
+def _entry_data_for_device(hass: HomeAssistant, device_id: str) -> dict | None:
+    """Look up a device in the device registry and return its entry's hass.data."""
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get(device_id)
+
+    if not device:
+        _LOGGER.error("Device %s not found in registry", device_id)
+        return None
+
+    if not device.config_entries:
+        _LOGGER.error("Device %s has no related config entries", device_id)
+        return None
+
+    # Renogy devices only have one config entry
+    entry_id = list(device.config_entries)[0]
+
+    data = hass.data[DOMAIN].get(entry_id)
+    if not data:
+        _LOGGER.error(
+            "Config entry %s for device %s not found in hass.data",
+            entry_id, device_id
+        )
+        return None
+    return data
+
+
+def _write_file(path: str, content: bytes):
+    with open(path, "wb") as fh:
+        fh.write(content)
+
+
 # ================================================================
 #   SETUP ENTRY
 # ================================================================
@@ -31,38 +80,58 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         _LOGGER.error("Unknown device type: %s", device_type)
         return False
 
+    hass.data.setdefault(DOMAIN, {})
+
     # ------------------------------------------------------------
-    # Create Modbus client
+    # Create Modbus client on the gateway's shared connection
     # ------------------------------------------------------------
+    pool: RenogyConnectionPool = hass.data[DOMAIN].setdefault(
+        DATA_POOL, RenogyConnectionPool()
+    )
+    connection = pool.acquire(
+        host,
+        port,
+        frame_gap=entry.data.get("frame_gap_ms", DEFAULT_FRAME_GAP_MS) / 1000,
+        pipeline_depth=entry.data.get("pipeline_depth", DEFAULT_PIPELINE_DEPTH),
+        serial_baud=entry.data.get("serial_baud", DEFAULT_SERIAL_BAUD),
+    )
+
+    # Optional local proxy, shared by every entry on this gateway: the first
+    # entry that asks for one decides where it listens
+    proxy_port = entry.data.get("proxy_port")
+    proxy_host = entry.data.get("proxy_host", DEFAULT_PROXY_HOST)
+    if proxy_port and connection.proxy is None:
+        try:
+            await connection.async_start_proxy(proxy_host, proxy_port, DEFAULT_PROXY_TTL)
+        except (OSError, RuntimeError) as err:
+            _LOGGER.error("Cannot start Modbus proxy for %s on port %s: %s", connection.key, proxy_port, err)
+    elif proxy_port and (connection.proxy.host, connection.proxy.port) != (proxy_host, proxy_port):
+        _LOGGER.warning(
+            "%s asks for a Modbus proxy on %s:%s, but the proxy for %s already listens on %s:%s; "
+            "ignoring the setting of this entry",
+            entry.title, proxy_host, proxy_port, connection.key, connection.proxy.host, connection.proxy.port,
+        )
+
     client = RenogyModbusClient(
         host=host,
         port=port,
         slave=slave,
+        connection=connection,
     )
 
-    try:
-        await client.connect()
-        _LOGGER.info("Connected to Renogy device %s at %s:%s", name, host, port)
-    except Exception as err:
-        _LOGGER.error("Modbus connection failed: %s", err)
-        return False
-
     # ------------------------------------------------------------
-    # Create coordinator (polling every 5 seconds)
+    # Create coordinator (polling every 5 seconds, adapting to activity)
     # ------------------------------------------------------------
     coordinator = RenogyCoordinator(
         hass=hass,
         client=client,
         profile=profile,
         device_name=name,
-        update_interval=5,
+        update_interval=DEFAULT_UPDATE_INTERVAL,
+        identity_store=IdentityStore(hass, entry.entry_id),
     )
 
-    # Initial data load
-    await coordinator.async_config_entry_first_refresh()
-
     # Store integration data
-    hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
         "client": client,
         "coordinator": coordinator,
@@ -86,29 +155,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
                 _LOGGER.error("Missing device_id or current value")
                 return
 
-            # ------------------------------------------------------------------
-            # Look up the device in Home Assistant's device registry
-            # ------------------------------------------------------------------
-            device_registry = dr.async_get(hass)
-            device = device_registry.async_get(device_id)
-
-            if not device:
-                _LOGGER.error("Device %s not found in registry", device_id)
-                return
-
-            if not device.config_entries:
-                _LOGGER.error("Device %s has no related config entries", device_id)
-                return
-
-            # Renogy devices only have one config entry
-            entry_id = list(device.config_entries)[0]
-
-            data = hass.data[DOMAIN].get(entry_id)
+            data = _entry_data_for_device(hass, device_id)
             if not data:
-                _LOGGER.error(
-                    "Config entry %s for device %s not found in hass.data",
-                    entry_id, device_id
-                )
                 return
 
             profile = data["profile"]
@@ -136,16 +184,65 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
                 _LOGGER.error("Failed writing current: %s", err)
                 return
 
+            # set_current_raw is slow-tier, read it back on the next cycle
+            coordinator: RenogyCoordinator = data["coordinator"]
+            coordinator.schedule_slow_refresh()
+            await coordinator.async_request_refresh()
+
         hass.services.async_register(
             DOMAIN,
             "set_max_charge_current",
             handle_set_max_charge_current,
         )
 
+    if not hass.services.has_service(DOMAIN, "export_frame_trace"):
+
+        async def handle_export_frame_trace(call: ServiceCall) -> ServiceResponse:
+            """Write the recent frames on a device's gateway to a pcap or JSON file."""
+
+            device_id = call.data.get("device_id")
+            fmt = call.data.get("format", "pcap")
+
+            data = _entry_data_for_device(hass, device_id) if device_id else None
+            if not data:
+                return None
+
+            # The trace covers the whole gateway, not just this device
+            connection = data["client"].connection
+            if fmt == "json":
+                content = json.dumps(trace_as_json(connection.frame_trace), indent=2).encode()
+            else:
+                content = trace_as_pcap(connection.frame_trace)
+
+            stamp = dt_util.utcnow().strftime("%Y%m%d_%H%M%S")
+            gateway = connection.key.replace(":", "_").replace(".", "-")
+            path = hass.config.path(f"renogy_modbus_trace_{gateway}_{stamp}.{fmt}")
+            await hass.async_add_executor_job(_write_file, path, content)
+
+            _LOGGER.info("Wrote frame trace of %s to %s", connection.key, path)
+            return {"path": path, "frames": min(connection.frame_trace.count, connection.frame_trace.slots)}
+
+        hass.services.async_register(
+            DOMAIN,
+            "export_frame_trace",
+            handle_export_frame_trace,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
     # ------------------------------------------------------------
     # Load platform(s)
     # ------------------------------------------------------------
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    # ------------------------------------------------------------
+    # Connect and load data in the background: entities start with their
+    # restored state, so setup does not wait for (or fail on) the gateway
+    # ------------------------------------------------------------
+    entry.async_create_background_task(
+        hass,
+        coordinator.async_refresh(),
+        f"{DOMAIN} first refresh {name}",
+    )
     return True
 
 
@@ -156,8 +253,14 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a Renogy Modbus config entry."""
     data = hass.data[DOMAIN].pop(entry.entry_id)
 
+    # Only closes the socket once the last entry on this gateway is gone
     client: RenogyModbusClient = data["client"]
-    await client.close()
+    await hass.data[DOMAIN][DATA_POOL].release(client.connection)
 
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Drop the persisted device identity of a removed entry."""
+    await IdentityStore(hass, entry.entry_id).async_remove()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# Growth factor applied to the interval per flat (no activity) cycle
+SLOWDOWN_FACTOR = 1.5
+
+
+class AdaptiveInterval:
+    """
+    Poll interval that follows device activity and link health.
+
+    - Activity (a watched value moved by more than its threshold) drops
+      the interval straight to ``min_interval``.
+    - Flat readings stretch it by SLOWDOWN_FACTOR per cycle, up to
+      ``max_interval``.
+    - Failed cycles back off exponentially up to ``backoff_max``; the first
+      good cycle after that returns to ``base``.
+
+    ``activity`` maps data keys to the change that counts as activity
+    (None: any change, e.g. for state strings).
+    """
+
+    def __init__(
+        self,
+        base: float,
+        min_interval: float,
+        max_interval: float,
+        backoff_max: float,
+        activity: dict | None = None,
+    ):
+        self.base = base
+        self.min_interval = min(min_interval, base)
+        self.max_interval = max(max_interval, base)
+        self.backoff_max = max(backoff_max, self.max_interval)
+        self.activity = activity or {}
+
+        self.interval = float(base)
+        self.failures = 0
+        self._last: dict = {}
+
+    def _is_active(self, data: dict) -> bool:
+        active = False
+        for key, threshold in self.activity.items():
+            value = data.get(key)
+            last = self._last.get(key)
+            self._last[key] = value
+
+            if value is None or last is None or value == last:
+                continue
+            if threshold is None or not isinstance(value, (int, float)):
+                active = True
+            elif abs(value - last) > threshold:
+                active = True
+        return active
+
+    def on_success(self, data: dict) -> float:
+        """Update after a good cycle and return the next interval (seconds)."""
+        if self.failures:
+            self.failures = 0
+            self.interval = float(self.base)
+            self._is_active(data)
+        elif self._is_active(data):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * SLOWDOWN_FACTOR, self.max_interval)
+        return self.interval
+
+    def on_failure(self) -> float:
+        """Update after a failed cycle and return the next interval (seconds)."""
+        self.failures += 1
+        self.interval = min(max(self.interval, self.base) * 2, self.backoff_max)
+        return self.interval
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-device circuit breaker.
+
+    closed     requests flow normally, consecutive failures are counted
+    open       after ``threshold`` consecutive failures; cycles fail fast
+               until the probe delay has passed
+    half_open  one cheap probe read is allowed; success closes the
+               breaker, failure re-opens it with a doubled delay
+    """
+
+    def __init__(self, name: str, threshold: int, base_delay: float, max_delay: float):
+        self.name = name
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.delay = base_delay
+        self._opened_at = 0.0
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed (0 unless open)."""
+        if self.state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.delay - time.monotonic())
+
+    def probe_due(self) -> bool:
+        """If open and the delay has passed, move to half-open and return True."""
+        if self.state == STATE_OPEN and self.retry_in == 0:
+            self.state = STATE_HALF_OPEN
+            _LOGGER.debug("%s: circuit half-open, probing", self.name)
+            return True
+        return False
+
+    def record_success(self):
+        """A request succeeded."""
+        if self.state != STATE_CLOSED:
+            _LOGGER.info("%s: device answering again, resuming polling", self.name)
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.delay = self.base_delay
+
+    def record_failure(self) -> bool:
+        """A request failed; return True if the breaker is (now) open."""
+        self.failures += 1
+
+        if self.state == STATE_HALF_OPEN:
+            self.delay = min(self.delay * 2, self.max_delay)
+            self._open()
+        elif self.state == STATE_CLOSED and self.failures >= self.threshold:
+            self.trips += 1
+            self._open()
+            _LOGGER.warning(
+                "%s: %d consecutive failures, failing fast for %.0f s",
+                self.name, self.failures, self.delay
+            )
+
+        return self.state == STATE_OPEN
+
+    def _open(self):
+        self.state = STATE_OPEN
+        self._opened_at = time.monotonic()
@@ -1,10 +1,29 @@
 from __future__ import annotations
 
+import logging
+
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.data_entry_flow import FlowResult
-
-from .const import DOMAIN, DEVICE_TYPES
+from homeassistant.helpers import config_validation as cv
+
+from .connection_pool import RenogyConnectionPool
+from .const import (
+    DATA_POOL,
+    DOMAIN,
+    DEFAULT_FRAME_GAP_MS,
+    DEFAULT_PIPELINE_DEPTH,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_PORT,
+    DEFAULT_SERIAL_BAUD,
+    DISCOVERY_FIRST_SLAVE,
+    DISCOVERY_LAST_SLAVE,
+    MAX_PIPELINE_DEPTH,
+    DEVICE_TYPES,
+)
+from .discovery import async_discover
+
+_LOGGER = logging.getLogger(__name__)
 
 
 class RenogyModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -17,6 +36,36 @@ class RenogyModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self._port: int | None = None
         self._slave: int | None = None
         self._name: str | None = None
+        self._frame_gap_ms: int = DEFAULT_FRAME_GAP_MS
+        self._pipeline_depth: int = DEFAULT_PIPELINE_DEPTH
+        self._serial_baud: int = DEFAULT_SERIAL_BAUD
+        self._proxy_port: int = DEFAULT_PROXY_PORT
+        self._proxy_host: str = DEFAULT_PROXY_HOST
+        self._discovered: dict[int, str] = {}
+
+    def _entry_data(self, slave: int, name: str, device_type: str) -> dict:
+        return {
+            "host": self._host,
+            "port": self._port,
+            "slave": slave,
+            "name": name,
+            "device_type": device_type,
+            "frame_gap_ms": self._frame_gap_ms,
+            "pipeline_depth": self._pipeline_depth,
+            "serial_baud": self._serial_baud,
+            "proxy_port": self._proxy_port,
+            "proxy_host": self._proxy_host,
+        }
+
+    def _proxy_conflict(self) -> bool:
+        """Return True if another entry on this gateway has its proxy elsewhere."""
+        for entry in self._async_current_entries():
+            data = entry.data
+            if (data.get("host"), data.get("port")) != (self._host, self._port) or not data.get("proxy_port"):
+                continue
+            if (data["proxy_port"], data.get("proxy_host", DEFAULT_PROXY_HOST)) != (self._proxy_port, self._proxy_host):
+                return True
+        return False
 
     async def async_step_user(self, user_input=None) -> FlowResult:
         """Step 1 – host, port, slave, name."""
@@ -27,9 +76,20 @@ class RenogyModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             self._port = user_input["port"]
             self._slave = user_input["slave"]
             self._name = user_input["name"]
-
-            # you could add basic validation here later
-            return await self.async_step_device_type()
+            self._frame_gap_ms = user_input.get("frame_gap_ms", DEFAULT_FRAME_GAP_MS)
+            self._pipeline_depth = user_input.get("pipeline_depth", DEFAULT_PIPELINE_DEPTH)
+            self._serial_baud = user_input.get("serial_baud", DEFAULT_SERIAL_BAUD)
+            self._proxy_port = user_input.get("proxy_port", DEFAULT_PROXY_PORT)
+            self._proxy_host = user_input.get("proxy_host", DEFAULT_PROXY_HOST)
+
+            # One proxy per gateway: a second entry cannot move it elsewhere
+            if self._proxy_port and self._proxy_conflict():
+                errors["proxy_port"] = "proxy_conflict"
+            elif user_input.get("discover"):
+                return await self.async_step_discover()
+            else:
+                # you could add basic validation here later
+                return await self.async_step_device_type()
 
         schema = vol.Schema(
             {
@@ -37,6 +97,25 @@ class RenogyModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Required("port", default=502): int,
                 vol.Required("slave", default=1): int,
                 vol.Required("name"): str,
+                vol.Optional("frame_gap_ms", default=DEFAULT_FRAME_GAP_MS): vol.All(
+                    int, vol.Range(min=0, max=1000)
+                ),
+                # Only for gateways / native TCP devices that accept several outstanding requests
+                vol.Optional("pipeline_depth", default=DEFAULT_PIPELINE_DEPTH): vol.All(
+                    int, vol.Range(min=1, max=MAX_PIPELINE_DEPTH)
+                ),
+                # RS485 baud rate behind a TCP/RTU gateway (0 = native Modbus TCP / unknown)
+                vol.Optional("serial_baud", default=DEFAULT_SERIAL_BAUD): vol.All(
+                    int, vol.Range(min=0, max=115200)
+                ),
+                # Serve the gateway to other Modbus TCP clients on this local port (0 = off)
+                vol.Optional("proxy_port", default=DEFAULT_PROXY_PORT): vol.All(
+                    int, vol.Range(min=0, max=65535)
+                ),
+                # Address the proxy listens on: 0.0.0.0 opens it to the network
+                vol.Optional("proxy_host", default=DEFAULT_PROXY_HOST): str,
+                # Scan the gateway for devices instead of adding this slave id only
+                vol.Optional("discover", default=False): bool,
             }
         )
 
@@ -53,13 +132,7 @@ class RenogyModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             device_type = user_input["device_type"]
             return self.async_create_entry(
                 title=self._name or "Renogy Modbus Device",
-                data={
-                    "host": self._host,
-                    "port": self._port,
-                    "slave": self._slave,
-                    "name": self._name,
-                    "device_type": device_type,
-                },
+                data=self._entry_data(self._slave, self._name, device_type),
             )
 
         choices = {key: cfg["name"] for key, cfg in DEVICE_TYPES.items()}
@@ -74,3 +147,101 @@ class RenogyModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="device_type",
             data_schema=schema,
         )
+
+    async def async_step_discover(self, user_input=None) -> FlowResult:
+        """Step 2 (discovery) – scan a slave id range on the gateway."""
+        errors = {}
+
+        if user_input is not None:
+            first = user_input["first_slave"]
+            last = user_input["last_slave"]
+
+            # Shares the gateway's connection with entries already set up on it
+            pool = self.hass.data.setdefault(DOMAIN, {}).setdefault(DATA_POOL, RenogyConnectionPool())
+            try:
+                found = await async_discover(
+                    pool,
+                    self._host,
+                    self._port,
+                    range(first, last + 1),
+                    concurrency=user_input["concurrency"],
+                    frame_gap=self._frame_gap_ms / 1000,
+                    first=self._slave,
+                )
+            except (ConnectionError, OSError) as err:
+                _LOGGER.error("Discovery on %s:%s failed: %s", self._host, self._port, err)
+                errors["base"] = "cannot_connect"
+            else:
+                # Leave out slaves that already have an entry
+                configured = {
+                    entry.data.get("slave")
+                    for entry in self._async_current_entries()
+                    if entry.data.get("host") == self._host and entry.data.get("port") == self._port
+                }
+                self._discovered = {s: t for s, t in found.items() if s not in configured}
+                if self._discovered:
+                    return await self.async_step_select()
+                errors["base"] = "no_devices_found"
+
+        schema = vol.Schema(
+            {
+                vol.Required("first_slave", default=DISCOVERY_FIRST_SLAVE): vol.All(
+                    int, vol.Range(min=1, max=247)
+                ),
+                vol.Required("last_slave", default=DISCOVERY_LAST_SLAVE): vol.All(
+                    int, vol.Range(min=1, max=247)
+                ),
+                # Ids probed at once; more than 1 needs a gateway that accepts pipelining
+                vol.Required("concurrency", default=self._pipeline_depth): vol.All(
+                    int, vol.Range(min=1, max=MAX_PIPELINE_DEPTH)
+                ),
+            }
+        )
+
+        return self.async_show_form(
+            step_id="discover",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async def async_step_select(self, user_input=None) -> FlowResult:
+        """Step 3 (discovery) – pick the devices to add, one entry each."""
+
+        if user_input is not None:
+            entries = [
+                self._entry_data(slave, f"{self._name} {slave}", self._discovered[slave])
+                for slave in sorted(int(s) for s in user_input["devices"])
+            ]
+            if not entries:
+                return self.async_abort(reason="no_devices_selected")
+
+            # A flow creates one entry, the others go through import flows
+            for data in entries[1:]:
+                self.hass.async_create_task(
+                    self.hass.config_entries.flow.async_init(
+                        DOMAIN,
+                        context={"source": config_entries.SOURCE_IMPORT},
+                        data=data,
+                    )
+                )
+            return self.async_create_entry(title=entries[0]["name"], data=entries[0])
+
+        choices = {
+            str(slave): f"Slave {slave}: {DEVICE_TYPES[device_type]['name']}"
+            for slave, device_type in self._discovered.items()
+        }
+
+        schema = vol.Schema(
+            {
+                vol.Required("devices", default=list(choices)): cv.multi_select(choices),
+            }
+        )
+
+        return self.async_show_form(
+            step_id="select",
+            data_schema=schema,
+        )
+
+    async def async_step_import(self, import_data) -> FlowResult:
+        """Create an entry for a device picked in another flow's discovery."""
+        return self.async_create_entry(title=import_data["name"], data=import_data)
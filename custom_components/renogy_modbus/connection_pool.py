@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import logging
+
+from .modbus_client import RenogyModbusConnection
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RenogyConnectionPool:
+    """
+    Process-wide pool of gateway connections keyed by host:port.
+
+    Every config entry behind the same gateway shares one socket. The pool
+    keeps a reference count per gateway and only closes the socket when
+    the last entry releases it.
+    """
+
+    def __init__(self):
+        self._connections: dict[str, RenogyModbusConnection] = {}
+        self._refs: dict[str, int] = {}
+
+    def acquire(
+        self,
+        host: str,
+        port: int,
+        frame_gap: float = 0.0,
+        pipeline_depth: int = 1,
+        serial_baud: int = 0,
+    ) -> RenogyModbusConnection:
+        """
+        Return the shared connection for host:port, creating it if needed.
+
+        Bus settings (inter-frame gap, pipeline depth, serial baud rate) are taken from
+        whichever entry opens the gateway first.
+        """
+        key = f"{host}:{port}"
+
+        connection = self._connections.get(key)
+        if connection is None:
+            connection = RenogyModbusConnection(
+                host, port, frame_gap=frame_gap, pipeline_depth=pipeline_depth,
+                serial_baud=serial_baud,
+            )
+            self._connections[key] = connection
+            self._refs[key] = 0
+
+        self._refs[key] += 1
+        _LOGGER.debug("Acquired connection %s (users: %d)", key, self._refs[key])
+        return connection
+
+    async def release(self, connection: RenogyModbusConnection):
+        """Drop one reference, closing the socket when nobody uses it."""
+        key = connection.key
+
+        if key not in self._refs:
+            return
+
+        self._refs[key] -= 1
+        _LOGGER.debug("Released connection %s (users: %d)", key, self._refs[key])
+
+        if self._refs[key] <= 0:
+            del self._refs[key]
+            del self._connections[key]
+            await connection.close()
+
+    def __len__(self) -> int:
+        return len(self._connections)
@@ -1,9 +1,123 @@
 DOMAIN = "renogy_modbus"
 
+# hass.data[DOMAIN] key holding the shared gateway connection pool
+DATA_POOL = "connection_pool"
+
+# Default idle time kept on the bus between two requests (milliseconds)
+DEFAULT_FRAME_GAP_MS = 0
+
+# Outstanding Modbus TCP transactions per gateway (1 = no pipelining)
+DEFAULT_PIPELINE_DEPTH = 1
+MAX_PIPELINE_DEPTH = 16
+
+# Baud rate of the RS485 bus behind a TCP/RTU gateway (8N1, 10 bits per
+# byte), so response timeouts allow for the frame length; 0 for native
+# Modbus TCP devices or when unknown (frame length ignored)
+DEFAULT_SERIAL_BAUD = 0
+
+# Connect timeout, and the bounds response timeouts adapt within (seconds).
+# The response timeout follows the gateway's measured round trip time plus,
+# with a serial baud rate set, the time the request and response take on
+# the RS485 side: at 9600 baud ~275 ms for a 125 register read, ~15 ms for
+# a single register. The floor leaves room for a controller's own latency;
+# the cap bounds what a retry to a silent slave holds up the bus for.
+CONNECT_TIMEOUT = 3
+RESPONSE_TIMEOUT_MIN = 0.5
+RESPONSE_TIMEOUT_MAX = 2
+
+# Slave id discovery: ids scanned by default, the response timeout while
+# no id has answered yet (absent ids only cost a timeout, so a full scan of
+# silent ids takes about 247 x DISCOVERY_TIMEOUT) and its bounds once it
+# follows the responders. Profiles name the register that identifies them
+# under a "fingerprint" key.
+DISCOVERY_FIRST_SLAVE = 1
+DISCOVERY_LAST_SLAVE = 247
+DISCOVERY_TIMEOUT = 0.2
+DISCOVERY_TIMEOUT_MIN = 0.05
+DISCOVERY_TIMEOUT_MAX = 0.5
+
+# Local Modbus TCP proxy in front of a gateway (0 = disabled) and the
+# address it listens on (local clients only by default). Cached registers
+# answer proxy reads until the slave's next poll is due: its coordinator's
+# current update interval plus PROXY_TTL_MARGIN seconds for the cycle
+# itself. Slaves no entry polls use DEFAULT_PROXY_TTL.
+DEFAULT_PROXY_PORT = 0
+DEFAULT_PROXY_HOST = "127.0.0.1"
+DEFAULT_PROXY_TTL = 5
+PROXY_TTL_MARGIN = 2
+
+# Modbus limit for a single read holding registers request
+MAX_READ_REGISTERS = 125
+
+# Unused registers tolerated between two specs before starting a new block read.
+# Profiles can override this with a "max_gap" key.
+DEFAULT_MAX_GAP = 10
+
+# Poll tiers a sensor can declare with its "poll" key (default: fast)
+POLL_STATIC = "static"   # read once at setup
+POLL_SLOW = "slow"       # read every DEFAULT_SLOW_INTERVAL seconds
+POLL_FAST = "fast"       # read every cycle
+
+DEFAULT_SLOW_INTERVAL = 300
+
+# Static registers are persisted per config entry (see identity.IdentityStore).
+# Profiles map device registry fields to data keys under an "identity" key;
+# its serial_number key is re-read on startup to validate the cache.
+IDENTITY_STORAGE_VERSION = 1
+
+# Adaptive poll interval bounds (seconds). Profiles list the values that
+# count as activity under an "activity" key: {data key: min change}.
+DEFAULT_UPDATE_INTERVAL = 5
+DEFAULT_MIN_INTERVAL = 2
+DEFAULT_MAX_INTERVAL = 30
+DEFAULT_BACKOFF_MAX = 300
+
+# Each polling cycle must finish within this fraction of the poll interval
+# (never less than MIN_CYCLE_DEADLINE seconds); blocks that miss it keep
+# their last-known values and are reported as stale.
+CYCLE_DEADLINE_FACTOR = 0.8
+MIN_CYCLE_DEADLINE = 2
+
+# Circuit breaker: consecutive failed reads before failing fast, and the
+# first probe delay (seconds, doubling up to DEFAULT_BACKOFF_MAX)
+BREAKER_THRESHOLD = 3
+BREAKER_BASE_DELAY = 10
+
+# State publishing policy a sensor can override with its "publish" key
+# (see publish.PublishPolicy). By default only changes are written, plus a
+# heartbeat every max_interval seconds.
+DEFAULT_PUBLISH = {"max_interval": 300}
+PUBLISH_ALWAYS = {"always": True}
+
+# Array register specs carry an "array" key:
+#   count       number of elements (registers = count x type width)
+#   length      optional data key holding the number of elements in use
+#   aggregates  sensors created for the array, from ARRAY_AGGREGATES
+#   attribute   aggregate whose entity also gets the elements as attribute
+#   precision   rounding of the aggregates, elements and attribute
+#   elements    optional data keys for the leading elements, one sensor each
+# The array itself is read as part of one block and decoded to a list.
+ARRAY_AGGREGATES = {"min": "Min", "max": "Max", "delta": "Delta", "mean": "Mean"}
+
+# Link-quality sensors shared by every device type (diagnostic, disabled by
+# default). Keys index RenogyCoordinator.link_stats.
+LINK_SENSORS = [
+    {"key": "rtt_mean", "name": "Request Time", "unit": "ms"},
+    {"key": "rtt_p95", "name": "Request Time p95", "unit": "ms"},
+    {"key": "queue_wait_mean", "name": "Bus Queue Wait", "unit": "ms"},
+    {"key": "cycle_mean", "name": "Update Duration", "unit": "ms"},
+    {"key": "error_rate", "name": "Request Error Rate", "unit": "%"},
+    {"key": "timeouts", "name": "Request Timeouts"},
+    {"key": "retries", "name": "Request Retries"},
+    {"key": "bus_utilisation", "name": "Bus Utilisation", "unit": "%"},
+]
+
 DEVICE_TYPES = {
     "smart_battery": {
         "name": "Smart Battery",
         "type": "battery",
+        "activity": {"current": 0.1, "state": None},
+        "fingerprint": 0x13B2,
         "sensors": [
             # Current
             {
@@ -13,6 +127,7 @@ DEVICE_TYPES = {
                 "type": "int16",
                 "scale": 0.01,
                 "unit": "A",
+                "publish": {"deadband": 0.05},
             },
 
             # Voltage
@@ -23,6 +138,7 @@ DEVICE_TYPES = {
                 "type": "uint16",
                 "scale": 0.1,
                 "unit": "V",
+                "publish": {"deadband": 0.05},
             },
 
             # Capacity raw
@@ -48,6 +164,7 @@ DEVICE_TYPES = {
                 "register": 0x13B6,
                 "type": "uint16",
                 "category": "diagnostic",
+                "poll": POLL_SLOW,
             },
             {
                 "key": "maxcap_reg2",
@@ -55,6 +172,7 @@ DEVICE_TYPES = {
                 "register": 0x13B7,
                 "type": "uint16",
                 "category": "diagnostic",
+                "poll": POLL_SLOW,
             },
 
             # Cycles raw
@@ -64,71 +182,90 @@ DEVICE_TYPES = {
                 "register": 0x13B8,
                 "type": "uint16",
                 "unit": "cycles",
+                "poll": POLL_SLOW,
             },
 
-            # Raw cell temps
+            # Cell voltages and temperatures: one array spec each, behind
+            # the register holding the number of cells actually fitted.
+            # Polled every cycle (cell imbalance and temperature matter while
+            # charging); with current and voltage this is one block read.
             {
-                "key": "temp1",
-                "name": "Cell 1 Temperature Raw",
-                "register": 5018,
-                "type": "int16",
-                "scale": 0.1,
-                "unit": "°C",
+                "key": "cell_count",
+                "name": "Cell Count",
+                "register": 5000,
+                "type": "uint16",
                 "category": "diagnostic",
             },
             {
-                "key": "temp2",
-                "name": "Cell 2 Temperature Raw",
-                "register": 5019,
-                "type": "int16",
+                "key": "cell_voltage",
+                "name": "Cell Voltage",
+                "register": 5001,
+                "type": "uint16",
                 "scale": 0.1,
-                "unit": "°C",
-                "category": "diagnostic",
+                "unit": "V",
+                "array": {
+                    "count": 16,
+                    "length": "cell_count",
+                    "aggregates": ("min", "max", "delta", "mean"),
+                    "attribute": "delta",
+                    "precision": 2,
+                },
             },
             {
-                "key": "temp3",
-                "name": "Cell 3 Temperature Raw",
-                "register": 5020,
-                "type": "int16",
-                "scale": 0.1,
-                "unit": "°C",
+                "key": "cell_temperature_count",
+                "name": "Cell Temperature Count",
+                "register": 5017,
+                "type": "uint16",
                 "category": "diagnostic",
             },
             {
-                "key": "temp4",
-                "name": "Cell 4 Temperature Raw",
-                "register": 5021,
+                "key": "cell_temperature",
+                "name": "Cell Temperature",
+                "register": 5018,
                 "type": "int16",
                 "scale": 0.1,
                 "unit": "°C",
-                "category": "diagnostic",
+                "publish": {"deadband": 0.5},
+                "array": {
+                    "count": 16,
+                    "length": "cell_temperature_count",
+                    "aggregates": ("min", "max", "delta"),
+                    "attribute": "max",
+                    "precision": 1,
+                    # The former per-cell temperature sensors, kept under
+                    # their keys so existing entities and history carry over
+                    "elements": ("temp1", "temp2", "temp3", "temp4"),
+                },
             },
         ],
 
         "virtual_sensors": [
-            {"key": "capacity_ah", "name": "Capacity", "unit": "Ah", "formula": "capacity_ah"},
+            {"key": "capacity_ah", "name": "Capacity", "unit": "Ah", "formula": "capacity_ah", "publish": {"deadband": 0.05}},
             {"key": "max_capacity_ah", "name": "Max Capacity", "unit": "Ah", "formula": "max_capacity_ah"},
-            {"key": "percentage", "name": "Percentage", "unit": "%", "formula": "percentage"},
-            {"key": "remaining_wh", "name": "Remaining Wh", "unit": "Wh", "formula": "remaining_wh"},
-            {"key": "temperature", "name": "Temperature", "unit": "°C", "formula": "average_temp"},
-            {"key": "state", "name": "State", "formula": "charging_state"},
-            {"key": "wattage", "name": "Wattage", "unit": "W", "formula": "wattage"},
+            {"key": "percentage", "name": "Percentage", "unit": "%", "formula": "percentage", "publish": {"deadband": 0.1}},
+            {"key": "remaining_wh", "name": "Remaining Wh", "unit": "Wh", "formula": "remaining_wh", "publish": {"relative": 0.005}},
+            {"key": "temperature", "name": "Temperature", "unit": "°C", "formula": "average_temp", "publish": {"deadband": 0.2}},
+            {"key": "state", "name": "State", "formula": "charging_state", "publish": PUBLISH_ALWAYS},
+            {"key": "wattage", "name": "Wattage", "unit": "W", "formula": "wattage", "publish": {"deadband": 1, "relative": 0.02}},
         ],
     },
 
     "dc_to_dc": {
         "name": "DC-DC Charger (DCC50S / DCC30S / Smart Charger)",
         "type": "dc_to_dc",
+        "activity": {"batt_current": 0.1, "alt_power": 5, "pv_power": 5, "charger_state": None},
+        "identity": {"serial_number": "serial_raw", "sw_version": "software_raw", "hw_version": "hardware_raw"},
+        "fingerprint": 0x000A,
         "sensors": [
             # -------------------------
             # Product information
             # -------------------------
-            {"key": "modbus_address", "name": "Modbus Address", "register": 0x001A, "type": "uint16", "category": "diagnostic"},
-            {"key": "rated_voltage_raw", "name": "Rated Voltage Raw", "register": 0x000A, "type": "uint16", "category": "diagnostic"},
-            {"key": "set_current_raw", "name": "Set Current Raw", "register": 0xE001, "type": "uint16", "category": "diagnostic"},
-            {"key": "serial_raw", "name": "Serial Raw", "register": 0x0018, "type": "uint32", "category": "diagnostic"},
-            {"key": "software_raw", "name": "Software Raw", "register": 0x0014, "type": "uint32", "category": "diagnostic"},
-            {"key": "hardware_raw", "name": "Hardware Raw", "register": 0x0016, "type": "uint32", "category": "diagnostic"},
+            {"key": "modbus_address", "name": "Modbus Address", "register": 0x001A, "type": "uint16", "category": "diagnostic", "poll": POLL_STATIC},
+            {"key": "rated_voltage_raw", "name": "Rated Voltage Raw", "register": 0x000A, "type": "uint16", "category": "diagnostic", "poll": POLL_STATIC},
+            {"key": "set_current_raw", "name": "Set Current Raw", "register": 0xE001, "type": "uint16", "category": "diagnostic", "poll": POLL_SLOW},
+            {"key": "serial_raw", "name": "Serial Raw", "register": 0x0018, "type": "uint32", "category": "diagnostic", "poll": POLL_STATIC},
+            {"key": "software_raw", "name": "Software Raw", "register": 0x0014, "type": "uint32", "category": "diagnostic", "poll": POLL_STATIC},
+            {"key": "hardware_raw", "name": "Hardware Raw", "register": 0x0016, "type": "uint32", "category": "diagnostic", "poll": POLL_STATIC},
 
             # -------------------------
             # Battery Side
@@ -156,10 +293,11 @@ DEVICE_TYPES = {
             {"key": "pv_current_raw", "name": "Hookup Current Raw", "register": 0x108, "type": "int16", "category": "diagnostic"},
 
             # -------------------------
-            # Energy
+            # Energy (today's counter feeds the Energy dashboard while
+            # charging, only the lifetime total is slow)
             # -------------------------
             {"key": "energy_today_raw", "name": "Energy Today Raw", "register": 0x113, "type": "uint16", "category": "diagnostic"},
-            {"key": "energy_total_raw", "name": "Energy Total Raw", "register": 0x11C, "type": "uint32", "category": "diagnostic"},
+            {"key": "energy_total_raw", "name": "Energy Total Raw", "register": 0x11C, "type": "uint32", "category": "diagnostic", "poll": POLL_SLOW},
 
             # -------------------------
             # State / Alarms
@@ -176,30 +314,30 @@ DEVICE_TYPES = {
 
             # -------- Battery side --------
             {"key": "batt_soc", "name": "Battery SOC", "unit": "%", "formula": "batt_soc"},
-            {"key": "batt_voltage", "name": "Battery Voltage", "unit": "V", "formula": "batt_voltage", "precision": 1},
-            {"key": "batt_current", "name": "Battery Current", "unit": "A", "formula": "batt_current", "precision": 2},
+            {"key": "batt_voltage", "name": "Battery Voltage", "unit": "V", "formula": "batt_voltage", "precision": 1, "publish": {"deadband": 0.05}},
+            {"key": "batt_current", "name": "Battery Current", "unit": "A", "formula": "batt_current", "precision": 2, "publish": {"deadband": 0.05}},
 
             # -------- Temperatures --------
             {"key": "temp_internal", "name": "Internal Temperature", "unit": "°C", "formula": "temp_internal"},
             {"key": "temp_probe", "name": "Probe Temperature", "unit": "°C", "formula": "temp_probe"},
 
             # -------- Alternator input --------
-            {"key": "alt_voltage", "name": "Alternator Voltage", "unit": "V", "formula": "alt_voltage", "precision": 1},
-            {"key": "alt_current", "name": "Alternator Current", "unit": "A", "formula": "alt_current", "precision": 2},
-            {"key": "alt_power", "name": "Alternator Power", "unit": "W", "formula": "alt_power"},
+            {"key": "alt_voltage", "name": "Alternator Voltage", "unit": "V", "formula": "alt_voltage", "precision": 1, "publish": {"deadband": 0.05}},
+            {"key": "alt_current", "name": "Alternator Current", "unit": "A", "formula": "alt_current", "precision": 2, "publish": {"deadband": 0.05}},
+            {"key": "alt_power", "name": "Alternator Power", "unit": "W", "formula": "alt_power", "publish": {"deadband": 1, "relative": 0.02}},
 
             # -------- PV / Hookup --------
-            {"key": "pv_voltage", "name": "Hookup Voltage", "unit": "V", "formula": "pv_voltage", "precision": 1},
-            {"key": "pv_current", "name": "Hookup Current", "unit": "A", "formula": "pv_current", "precision": 2},
-            {"key": "pv_power", "name": "Hookup Power", "unit": "W", "formula": "pv_power"},
+            {"key": "pv_voltage", "name": "Hookup Voltage", "unit": "V", "formula": "pv_voltage", "precision": 1, "publish": {"deadband": 0.05}},
+            {"key": "pv_current", "name": "Hookup Current", "unit": "A", "formula": "pv_current", "precision": 2, "publish": {"deadband": 0.05}},
+            {"key": "pv_power", "name": "Hookup Power", "unit": "W", "formula": "pv_power", "publish": {"deadband": 1, "relative": 0.02}},
 
             # -------- Energy --------
             {"key": "energy_today", "name": "Energy Today", "unit": "Wh", "formula": "energy_today"},
             {"key": "energy_total", "name": "Energy Total", "unit": "Wh", "formula": "energy_total"},
 
             # -------- State --------
-            {"key": "charger_state", "name": "Charger State", "formula": "charger_state"},
-            {"key": "alarms", "name": "Charger Alarms", "formula": "alarms"},
+            {"key": "charger_state", "name": "Charger State", "formula": "charger_state", "publish": PUBLISH_ALWAYS},
+            {"key": "alarms", "name": "Charger Alarms", "formula": "alarms", "publish": PUBLISH_ALWAYS},
 
             # ------- Control ---------
             {"key": "max_charge_current", "name": "Max Charge Current", "unit": "A", "formula": "max_charge_current", "precision": 1}
@@ -1,8 +1,32 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from datetime import timedelta
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .adaptive import AdaptiveInterval
+from .breaker import STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker
+from .const import (
+    BREAKER_BASE_DELAY,
+    BREAKER_THRESHOLD,
+    CYCLE_DEADLINE_FACTOR,
+    DEFAULT_BACKOFF_MAX,
+    DEFAULT_MAX_GAP,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_SLOW_INTERVAL,
+    MIN_CYCLE_DEADLINE,
+    POLL_FAST,
+    POLL_SLOW,
+    POLL_STATIC,
+    PROXY_TTL_MARGIN,
+)
+from .formulas import FormulaEngine
+from .identity import async_update_device_identity, registry_fields
+from .planner import attach_covered, build_read_plan, sensors_for_tiers
+from .scheduler import PRIORITY_FAST, PRIORITY_SLOW
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -10,7 +34,21 @@ _LOGGER = logging.getLogger(__name__)
 class RenogyCoordinator(DataUpdateCoordinator):
     """Coordinator for polling Modbus data from a Renogy device."""
 
-    def __init__(self, hass, client, profile, device_name, update_interval):
+    def __init__(
+        self,
+        hass,
+        client,
+        profile,
+        device_name,
+        update_interval,
+        max_gap=None,
+        slow_interval=DEFAULT_SLOW_INTERVAL,
+        min_interval=DEFAULT_MIN_INTERVAL,
+        max_interval=DEFAULT_MAX_INTERVAL,
+        backoff_max=DEFAULT_BACKOFF_MAX,
+        identity_store=None,
+        cancel_stale_reads=True,
+    ):
         super().__init__(
             hass,
             _LOGGER,
@@ -21,46 +59,423 @@ class RenogyCoordinator(DataUpdateCoordinator):
         self.client = client
         self.profile = profile
         self.device_name = device_name
+        self.slow_interval = slow_interval
+        self.cancel_stale_reads = cancel_stale_reads
+
+        # Poll faster while the device is busy, slower when idle or unreachable
+        self.adaptive = AdaptiveInterval(
+            base=update_interval,
+            min_interval=min_interval,
+            max_interval=max_interval,
+            backoff_max=backoff_max,
+            activity=profile.get("activity"),
+        )
+
+        # Stop hammering an unreachable device, probe it on an exponential schedule
+        self.breaker = CircuitBreaker(
+            device_name,
+            threshold=BREAKER_THRESHOLD,
+            base_delay=BREAKER_BASE_DELAY,
+            max_delay=backoff_max,
+        )
+
+        if max_gap is None:
+            max_gap = profile.get("max_gap", DEFAULT_MAX_GAP)
+
+        self.max_gap = max_gap
+
+        # Virtual sensors, evaluated once per update in dependency order
+        self.formulas = FormulaEngine(profile)
+
+        # Data keys the coordinator needs whatever entities are enabled:
+        # the device registry identity and the activity that drives the
+        # poll interval
+        self._required_keys = set(profile.get("identity", {}).values())
+        for key in profile.get("activity", {}):
+            self._required_keys |= self.formulas.inputs.get(key, {key})
+
+        # Every register is polled until the entities report which are enabled
+        sensors = profile["sensors"]
+        self._static_done = False
+        self._last_slow: float | None = None
+        self._build_read_plans(sensors)
+
+        # Static registers persisted across restarts: on the first cycle
+        # only the serial number is read to validate the cached values
+        self.identity = profile.get("identity", {})
+        self.identity_store = identity_store
+        self.identity_source: str | None = None
+        serial = [s for s in sensors if s["key"] == self.identity.get("serial_number")]
+        self._serial_plan = build_read_plan(serial) if serial else []
+        self._identity_checked = identity_store is None or not self._serial_plan
+
+        # Partial results: when each key was last read, ages of last-known
+        # values served after their block missed the deadline, cycle timing
+        self._fresh_at: dict[str, float] = {}
+        self.stale: dict[str, float] = {}
+        self.last_cycle: dict = {}
+        self._cycle_running = False
+
+        # Request / cycle statistics, flattened once per cycle for sensors
+        self.link_stats: dict = {}
+
+    def _build_read_plans(self, sensors: list[dict]):
+        """
+        One coalesced read plan per tier, for the given register specs:
+            fast   -> fast registers only (every cycle)
+            slow   -> fast + slow registers (every slow_interval)
+            static -> everything (until static registers have been read once)
+        Registers of any spec that fall inside a planned block are decoded
+        for free.
+        """
+        self.read_plans = {}
+        for tier, tiers in (
+            (POLL_FAST, (POLL_FAST,)),
+            (POLL_SLOW, (POLL_FAST, POLL_SLOW)),
+            (POLL_STATIC, (POLL_FAST, POLL_SLOW, POLL_STATIC)),
+        ):
+            plan = build_read_plan(sensors_for_tiers(sensors, tiers), max_gap=self.max_gap)
+            attach_covered(plan, self.profile["sensors"])
+            self.read_plans[tier] = plan
+
+        self._planned_keys = {s["key"] for s in sensors}
+        self._static_keys = {s["key"] for s in sensors_for_tiers(sensors, (POLL_STATIC,))}
+        self._slow_keys = {s["key"] for s in sensors_for_tiers(sensors, (POLL_SLOW,))}
+
+        # Cheapest possible liveness check: first register of the fast plan
+        plan = next((p for p in self.read_plans.values() if p), None)
+        self._probe_register = plan[0].start if plan else self.profile["sensors"][0]["register"]
+
+        _LOGGER.debug(
+            "%s: %d registers planned as %s block reads (fast/slow/static)",
+            self.device_name,
+            len(sensors),
+            "/".join(str(len(self.read_plans[t])) for t in (POLL_FAST, POLL_SLOW, POLL_STATIC)),
+        )
+
+    def set_enabled_keys(self, keys):
+        """
+        Poll only the registers behind the enabled entities.
+
+        ``keys`` are the data keys of the enabled entities. Virtual sensors
+        and array aggregates pull in the raw registers they are computed
+        from. Registers that become needed are read on the next cycle, even
+        if their tier is not due.
+        """
+        needed = set(self._required_keys)
+        for key in keys:
+            needed |= self.formulas.inputs.get(key, {key})
+        for spec in self.formulas.arrays:
+            if spec["key"] in needed and spec["array"].get("length"):
+                needed.add(spec["array"]["length"])
+
+        sensors = [s for s in self.profile["sensors"] if s["key"] in needed]
+        if {s["key"] for s in sensors} == self._planned_keys:
+            return
+
+        added = {s["key"] for s in sensors} - self._planned_keys
+        self._build_read_plans(sensors)
+
+        data = self.data or {}
+        missing = {key for key in added if data.get(key) is None}
+        if missing & self._static_keys:
+            self._static_done = False
+        if missing & self._slow_keys:
+            self._last_slow = None
+
+    def _select_tier(self) -> str:
+        """Pick the read plan for this cycle."""
+        if not self._static_done:
+            return POLL_STATIC
+        if self._last_slow is None or time.monotonic() - self._last_slow >= self.slow_interval:
+            return POLL_SLOW
+        return POLL_FAST
+
+    def schedule_slow_refresh(self):
+        """Re-read slow registers on the next cycle (e.g. after a write)."""
+        self._last_slow = None
+
+    def _set_failure_interval(self):
+        """Back off after a failed cycle; while open, wake up for the next probe."""
+        interval = self.adaptive.on_failure()
+        if self.breaker.state == STATE_OPEN:
+            interval = max(self.breaker.retry_in, 1)
+        self.update_interval = timedelta(seconds=interval)
+
+    def _update_proxy_ttl(self):
+        """Let the gateway's proxy serve this slave's blocks until its next poll is due."""
+        cache = self.client.connection.cache
+        if cache is not None:
+            cache.set_ttl(self.client.slave, self.update_interval.total_seconds() + PROXY_TTL_MARGIN)
+
+    async def _async_probe(self):
+        """Half-open: one single-register read decides whether to resume polling."""
+        raw = await self.client.read_register(self._probe_register, count=1, priority=PRIORITY_FAST)
+        if raw is None:
+            self.breaker.record_failure()
+            self._set_failure_interval()
+            raise UpdateFailed(
+                f"{self.device_name} still unreachable, next probe in {self.breaker.retry_in:.0f} s"
+            )
+        self.breaker.record_success()
+
+    async def _async_restore_identity(self, result: dict):
+        """Seed the static values from storage if the device's serial number still matches."""
+        self._identity_checked = True
+        cached = await self.identity_store.async_load()
+        if not cached or not self._static_keys <= cached.keys():
+            return
+
+        block = self._serial_plan[0]
+        raw = await self._async_read_block(block)
+        if raw is None or len(raw) < block.count:
+            # The static tier reads the serial number again anyway
+            return
+
+        serial_key = self.identity["serial_number"]
+        serial = block.decode(raw)[serial_key]
+        if serial != cached[serial_key]:
+            _LOGGER.info(
+                "%s: serial number changed (%s -> %s), re-reading product information",
+                self.device_name, cached[serial_key], serial,
+            )
+            return
+
+        now = time.monotonic()
+        for key in self._static_keys:
+            result[key] = cached[key]
+            self._fresh_at[key] = now
+        self._static_done = True
+        self.identity_source = "cache"
+        self._publish_identity(result)
+
+    async def _async_save_identity(self, result: dict):
+        """Persist freshly read static values and publish them to the device registry."""
+        self.identity_source = "device"
+        if self.identity_store is not None:
+            await self.identity_store.async_save({k: result[k] for k in self._static_keys})
+        self._publish_identity(result)
+
+    def _publish_identity(self, result: dict):
+        if self.hass is not None:
+            async_update_device_identity(
+                self.hass, self.device_name, registry_fields(self.identity, result)
+            )
+
+    async def _async_read_block(self, block):
+        """Read one block (the scheduler decides when it hits the bus)."""
+        # Blocks only read for slow / static registers yield to fast polling
+        priority = PRIORITY_FAST if block.poll == POLL_FAST else PRIORITY_SLOW
+        started = time.monotonic()
+        raw = await self.client.read_register(block.start, count=block.count, priority=priority)
+        self.client.stats.record_block(
+            f"0x{block.start:04X}+{block.count}", (time.monotonic() - started) * 1000
+        )
+        return raw
+
+    def _update_stale(self, stale_blocks, now: float):
+        """Tag values of blocks that missed the deadline with their age."""
+        stale = {}
+        for block in stale_blocks:
+            for sensor in block.sensors:
+                key = sensor["key"]
+                if key in self._fresh_at:
+                    stale[key] = round(now - self._fresh_at[key], 1)
+
+        # Virtual sensors are as old as their oldest stale input
+        for vkey, inputs in self.formulas.inputs.items():
+            ages = [stale[k] for k in inputs if k in stale]
+            if ages:
+                stale[vkey] = max(ages)
+
+        self.stale = stale
+
+    def _publish_partial(self, result: dict):
+        """Hand the values read so far to the entities while the cycle goes on."""
+        self.data = {**result, **self.formulas.evaluate(result)}
+        self.async_update_listeners()
+
+    def _update_link_stats(self):
+        self.link_stats = {
+            **self.client.stats.summary(),
+            "bus_utilisation": round(self.client.connection.scheduler.utilisation * 100, 1),
+        }
 
     async def _async_update_data(self):
         """Fetch data from Modbus and return cleaned, scaled values."""
 
-        result = {}
+        # Never let refreshes pile up behind a slow gateway. Skipping keeps
+        # the last data (None before the first update, so entities keep
+        # their restored state instead of going unavailable)
+        if self._cycle_running:
+            _LOGGER.debug("%s: previous update still running, skipping", self.device_name)
+            return self.data
 
+        self._cycle_running = True
         try:
-            for sensor in self.profile["sensors"]:
+            return await self._async_update_cycle()
+        finally:
+            self._cycle_running = False
+            self._update_link_stats()
 
-                key = sensor["key"]
-                reg = sensor["register"]
-                count = sensor.get("count", 1)
-                reg_type = sensor.get("type")
-                scale = sensor.get("scale")
+    async def _async_update_cycle(self):
+        """One polling cycle against a deadline derived from the poll interval."""
+
+        # ------------------------------------------------------------
+        # Circuit breaker: fail fast while open, probe when due
+        # ------------------------------------------------------------
+        if self.breaker.state == STATE_OPEN and not self.breaker.probe_due():
+            self._set_failure_interval()
+            raise UpdateFailed(
+                f"{self.device_name} unreachable, next probe in {self.breaker.retry_in:.0f} s"
+            )
+
+        # Connecting happens here rather than at setup, so an unreachable
+        # gateway only makes its devices unavailable
+        if not self.client.connection.connected:
+            try:
+                await self.client.connect()
+            except Exception as err:
+                self.breaker.record_failure()
+                self._set_failure_interval()
+                raise UpdateFailed(f"{self.device_name} cannot connect: {err}") from err
+
+        if self.breaker.state == STATE_HALF_OPEN:
+            await self._async_probe()
+
+        # Reads of an earlier cycle still waiting for the bus are outdated
+        if self.cancel_stale_reads:
+            dropped = self.client.cancel_queued_reads()
+            if dropped:
+                _LOGGER.debug("%s: dropped %d queued reads of the previous cycle", self.device_name, dropped)
+
+        # Keep static / slow values between the cycles that read them
+        result = dict(self.data) if self.data else {}
+
+        if not self._identity_checked:
+            await self._async_restore_identity(result)
 
-                # Read register(s)
-                raw = await self.client.read_register(reg, count=count)
+        tier = self._select_tier()
+        plan = self.read_plans[tier]
+        blocks_ok = 0
+        blocks_failed = 0
 
-                if raw is None:
-                    _LOGGER.warning(
-                        "Failed to read register 0x%04X for key '%s'",
-                        reg, key
-                    )
-                    result[key] = None
-                    continue
+        started = time.monotonic()
+        deadline = max(
+            self.update_interval.total_seconds() * CYCLE_DEADLINE_FACTOR,
+            MIN_CYCLE_DEADLINE,
+        )
+
+        # All blocks are queued at once; whatever completes before the
+        # deadline is used, the rest keeps its last-known values
+        tasks = {
+            asyncio.ensure_future(self._async_read_block(block)): block for block in plan
+        }
+        pending = set(tasks)
+
+        try:
+            while pending:
+                remaining = started + deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    block = tasks[task]
+                    raw = task.result()
+
+                    if raw is None or len(raw) < block.count:
+                        _LOGGER.warning(
+                            "Failed to read block 0x%04X-0x%04X (%s)",
+                            block.start, block.end - 1,
+                            ", ".join(s["key"] for s in block.sensors)
+                        )
+                        blocks_failed += 1
+                        for sensor in block.sensors:
+                            result[sensor["key"]] = None
+                            self._fresh_at.pop(sensor["key"], None)
+
+                        # Too many failures in a row: abort the rest of the cycle
+                        if self.breaker.record_failure():
+                            self._set_failure_interval()
+                            raise UpdateFailed(
+                                f"{self.device_name} not responding, aborting update"
+                            )
+                        continue
 
-                value = raw[0]
+                    self.breaker.record_success()
 
-                # Signed 16-bit conversion
-                if reg_type == "int16" and value > 0x7FFF:
-                    value -= 0x10000
+                    # Single struct pass: sign, 32-bit combine and scale
+                    values = block.decode(raw)
+                    result.update(values)
+                    blocks_ok += 1
 
-                # Apply scale
-                if scale:
-                    value = value * scale
+                    now = time.monotonic()
+                    for key in values:
+                        self._fresh_at[key] = now
 
-                result[key] = value
+                # Blocks that are in go out now, not at the end of the cycle
+                if pending:
+                    self._publish_partial(result)
 
-            return result
+        except UpdateFailed:
+            raise
 
         except Exception as e:
             _LOGGER.error("Unexpected Modbus update failure: %s", e)
             raise
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # ------------------------------------------------------------
+        # Blocks that missed the deadline
+        # ------------------------------------------------------------
+        # A missed deadline usually means a busy bus (other slaves, a silent
+        # one retrying), not a failing device: the breaker only counts
+        # reads that came back empty or short
+        now = time.monotonic()
+        stale_blocks = [tasks[task] for task in pending]
+        if stale_blocks:
+            _LOGGER.debug(
+                "%s: %d of %d blocks missed the %.1f s deadline",
+                self.device_name, len(stale_blocks), len(plan), deadline
+            )
+        self._update_stale(stale_blocks, now)
+
+        # Only mark a tier done once all of its registers came back
+        if tier == POLL_STATIC:
+            self._static_done = all(result.get(k) is not None for k in self._static_keys)
+            if self._static_done and self._static_keys:
+                await self._async_save_identity(result)
+        if tier in (POLL_STATIC, POLL_SLOW) and all(
+            result.get(k) is not None for k in self._slow_keys
+        ):
+            self._last_slow = time.monotonic()
+
+        # Derived values live next to the raw ones
+        result.update(self.formulas.evaluate(result))
+
+        # Nothing planned (every entity disabled) is not a failure
+        if blocks_ok or not plan:
+            self.update_interval = timedelta(seconds=self.adaptive.on_success(result))
+            self._update_proxy_ttl()
+        else:
+            self._set_failure_interval()
+
+        self.last_cycle = {
+            "tier": tier,
+            "duration": round(now - started, 3),
+            "deadline": round(deadline, 3),
+            "blocks": len(plan),
+            "blocks_ok": blocks_ok,
+            "blocks_failed": blocks_failed,
+            "blocks_stale": len(stale_blocks),
+        }
+        self.client.stats.cycle.record((now - started) * 1000)
+
+        return result
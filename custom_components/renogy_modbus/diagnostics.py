@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DEVICE_TYPES, DOMAIN
+
+# Gateway address, the entry's names and ids, and each profile's serial number key
+TO_REDACT = {"host", "title", "name", "unique_id", "serial_number"} | {
+    profile["identity"]["serial_number"]
+    for profile in DEVICE_TYPES.values()
+    if "serial_number" in profile.get("identity", {})
+}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """
+    Return diagnostics for a config entry: link statistics and polling state.
+
+    Raw frames carry the identity registers (serial numbers) in the clear,
+    so they are left out; the export_frame_trace service writes them to a
+    file on request.
+    """
+    data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = data["coordinator"]
+    client = data["client"]
+    connection = client.connection
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "polling": {
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "breaker": {
+                "state": coordinator.breaker.state,
+                "failures": coordinator.breaker.failures,
+                "trips": coordinator.breaker.trips,
+                "retry_in": round(coordinator.breaker.retry_in, 1),
+            },
+            "last_cycle": coordinator.last_cycle,
+            "identity_source": coordinator.identity_source,
+            "stale": coordinator.stale,
+            "read_plans": {
+                tier: [f"0x{b.start:04X}+{b.count}" for b in plan]
+                for tier, plan in coordinator.read_plans.items()
+            },
+        },
+        "device": client.stats.as_dict(),
+        "gateway": {
+            "connected": connection.connected,
+            "pipeline_depth": connection.pipeline_depth,
+            "response_timeout": connection.response_timeout,
+            "wire": connection.wire.as_dict(),
+            "scheduler": connection.scheduler.stats(),
+            "proxy": connection.proxy.stats() if connection.proxy else None,
+            "frame_trace": {
+                "frames": min(connection.frame_trace.count, connection.frame_trace.slots),
+                "export": f"{DOMAIN}.export_frame_trace",
+            },
+        },
+        "data": async_redact_data(coordinator.data, TO_REDACT),
+    }
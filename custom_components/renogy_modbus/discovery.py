@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from .connection_pool import RenogyConnectionPool
+from .const import (
+    DEVICE_TYPES,
+    DISCOVERY_TIMEOUT,
+    DISCOVERY_TIMEOUT_MAX,
+    DISCOVERY_TIMEOUT_MIN,
+)
+from .modbus_client import RenogyModbusConnection
+from .vendor.pymodbus.exceptions import ConnectionException, ModbusIOException
+from .vendor.pymodbus.transaction.rtt import RttEstimator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def _fingerprint(connection: RenogyModbusConnection, slave: int, rtt: RttEstimator) -> str | None:
+    """
+    Identify the device behind one slave id.
+
+    Every profile's fingerprint register is read in turn: the first one
+    answered with data names the device type. A timeout means nothing is
+    listening on that id; an exception response means some device is, but
+    not that type.
+    """
+    for device_type, profile in DEVICE_TYPES.items():
+        register = profile.get("fingerprint")
+        if register is None:
+            continue
+        try:
+            resp = await connection.probe(slave, register, rtt)
+        except ModbusIOException:
+            return None
+        if resp is None:
+            return None
+        if not resp.isError():
+            return device_type
+    return None
+
+
+async def async_discover(
+    pool: RenogyConnectionPool,
+    host: str,
+    port: int,
+    slaves,
+    concurrency: int = 1,
+    frame_gap: float = 0.0,
+    first: int | None = None,
+) -> dict[int, str]:
+    """
+    Scan slave ids on a gateway and return {slave: device type} of the responders.
+
+    The scan runs on the gateway's pooled connection, so on a gateway
+    that is already polled it shares the socket and bus scheduler (probes
+    go ahead of polling, like any interactive request) instead of opening
+    a second one. Otherwise a connection is opened with ``frame_gap`` and
+    a pipeline depth of ``concurrency`` and closed again afterwards.
+
+    Absent ids cost one response timeout and never back off: a short
+    fixed DISCOVERY_TIMEOUT until some id answers, then the round trip
+    time of the responders (DISCOVERY_TIMEOUT_MIN..MAX). Up to
+    ``concurrency`` ids are queued at once. ``first`` (a known device, if
+    any) is probed before the others so the timeout adapts from the start.
+    """
+    slaves = sorted(slaves, key=lambda slave: slave != first)
+    rtt = RttEstimator(DISCOVERY_TIMEOUT, DISCOVERY_TIMEOUT_MIN, DISCOVERY_TIMEOUT_MAX, backoff=False)
+
+    connection = pool.acquire(host, port, frame_gap=frame_gap, pipeline_depth=concurrency)
+    found: dict[int, str] = {}
+    slots = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+
+    async def probe(slave: int):
+        async with slots:
+            device_type = await _fingerprint(connection, slave, rtt)
+        if device_type:
+            _LOGGER.debug("Slave %d on %s:%s is a %s", slave, host, port, device_type)
+            found[slave] = device_type
+
+    pending = {asyncio.ensure_future(probe(slave)) for slave in slaves}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+    except ConnectionException as err:
+        raise ConnectionError(f"Lost connection to Modbus gateway {host}:{port}: {err}") from err
+    finally:
+        # No probe may still be queued on the connection once it is released
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await pool.release(connection)
+
+    _LOGGER.info(
+        "Scanned %d slave ids on %s:%s in %.1f s, found %d devices (response timeout %.0f ms)",
+        len(slaves), host, port, time.monotonic() - started, len(found),
+        rtt.timeout * 1000,
+    )
+    return dict(sorted(found.items()))
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+
+_LOGGER = logging.getLogger(__name__)
+
+# ============================================================
+#  FORMULA REGISTRY
+# ============================================================
+
+# formula name -> (function, input names)
+# Inputs are raw register keys or the names of other formulas.
+FORMULAS: dict[str, tuple[Callable, tuple[str, ...]]] = {}
+
+
+def formula(name: str, *inputs: str):
+    """Register a formula computed from the named inputs."""
+
+    def register(func):
+        FORMULAS[name] = (func, inputs)
+        return func
+
+    return register
+
+
+# ============================================================
+#  COMMON UTILITY FORMULAS (used by Smart Battery)
+# ============================================================
+
+def combine_capacity(reg1, reg2):
+    """Renogy special 32-bit capacity combine."""
+    if reg1 is None or reg2 is None:
+        return None
+    raw = reg1 * 32768 + (reg2 // 2)
+    return raw * 0.002
+
+
+@formula("capacity_ah", "cap_reg1", "cap_reg2")
+def capacity_ah(reg1, reg2):
+    return combine_capacity(reg1, reg2)
+
+
+@formula("max_capacity_ah", "maxcap_reg1", "maxcap_reg2")
+def max_capacity_ah(reg1, reg2):
+    return combine_capacity(reg1, reg2)
+
+
+@formula("percentage", "capacity_ah", "max_capacity_ah")
+def percentage(cap, maxcap):
+    if cap is None or maxcap is None or maxcap == 0:
+        return None
+    pct = (cap / maxcap) * 100
+    return max(0, min(100, pct))
+
+
+@formula("wattage", "voltage", "current")
+def wattage(voltage, current):
+    if current is None or voltage is None:
+        return None
+    return current * voltage
+
+
+@formula("remaining_wh", "capacity_ah", "voltage")
+def remaining_wh(capacity_ah, voltage):
+    if capacity_ah is None or voltage is None:
+        return None
+    return capacity_ah * voltage
+
+
+@formula("average_temp", "cell_temperature")
+def average_temp(cells):
+    values = [v for v in cells or () if v is not None]
+    return (sum(values) / len(values)) if values else None
+
+
+@formula("charging_state", "current")
+def charging_state(current):
+    if current is None:
+        return None
+    if current < 0:
+        return "Discharging"
+    if current > 0:
+        return "Charging"
+    return "Idle"
+
+
+# ============================================================
+#  DC-DC CHARGER FORMULAS
+# ============================================================
+
+@formula("rated_voltage", "rated_voltage_raw")
+def rated_voltage(raw):
+    return raw // 256 if raw is not None else None
+
+
+@formula("rated_current", "rated_voltage_raw")
+def rated_current(raw):
+    return raw % 256 if raw is not None else None
+
+
+@formula("batt_soc", "batt_soc_raw")
+def batt_soc(raw):
+    return raw
+
+
+@formula("batt_voltage", "batt_voltage_raw")
+def batt_voltage(raw):
+    return raw * 0.1 if raw is not None else None
+
+
+@formula("batt_current", "batt_current_raw")
+def batt_current(raw):
+    return raw * 0.01 if raw is not None else None
+
+
+@formula("temp_internal", "temp_packed_raw")
+def temp_internal(raw):
+    return raw // 256 if raw is not None else None
+
+
+@formula("temp_probe", "temp_packed_raw")
+def temp_probe(raw):
+    return raw % 256 if raw is not None else None
+
+
+@formula("alt_voltage", "alt_voltage_raw")
+def alt_voltage(raw):
+    return raw * 0.1 if raw is not None else None
+
+
+@formula("alt_current", "alt_current_raw")
+def alt_current(raw):
+    return raw * 0.01 if raw is not None else None
+
+
+@formula("alt_power", "alt_power_raw")
+def alt_power(raw):
+    return raw
+
+
+@formula("pv_voltage", "pv_voltage_raw")
+def pv_voltage(raw):
+    return raw * 0.1 if raw is not None else None
+
+
+@formula("pv_current", "pv_current_raw")
+def pv_current(raw):
+    return raw * 0.01 if raw is not None else None
+
+
+@formula("pv_power", "pv_voltage", "pv_current")
+def pv_power(v, c):
+    if v is None or c is None:
+        return None
+    return v * c
+
+
+@formula("energy_today", "energy_today_raw")
+def energy_today(raw):
+    return raw
+
+
+@formula("energy_total", "energy_total_raw")
+def energy_total(raw):
+    return raw
+
+
+CHARGER_STATES = {
+    0: "Not Charging",
+    2: "MPPT Charging",
+    3: "Equalization",
+    4: "Boost Charging",
+    5: "Float Charging",
+    6: "Current Limited",
+    8: "Direct Charging",
+}
+
+
+@formula("charger_state", "state_raw")
+def charger_state(raw):
+    return CHARGER_STATES.get(raw, f"Unknown ({raw})")
+
+
+@formula("alarms", "alarm_a_raw", "alarm_b_raw")
+def alarms(a, b):
+    # An alarm register that has not been read counts as no alarm bits set
+    a = a or 0
+    b = b or 0
+    msgs = []
+
+    # Alarm A
+    if a & (1 << 4): msgs.append("Controller Inside Over Temp")
+    if a & (1 << 5): msgs.append("Alternator Input Over Current")
+    if a & (1 << 8): msgs.append("Alternator Input Over Voltage")
+    if a & (1 << 9): msgs.append("Starter Battery Reverse Polarity")
+    if a & (1 << 10): msgs.append("BMS Over Charge Protection")
+    if a & (1 << 11): msgs.append("Low Temperature Cutoff")
+
+    # Alarm B
+    if b & (1 << 1): msgs.append("Battery Over Discharged")
+    if b & (1 << 2): msgs.append("Battery Over Charged")
+    if b & (1 << 5): msgs.append("Controller Inside Temp Too High")
+    if b & (1 << 6): msgs.append("Battery Over Temp")
+    if b & (1 << 7): msgs.append("Hookup Input Too High")
+    if b & (1 << 10): msgs.append("Hookup Input Over Voltage")
+    if b & (1 << 12): msgs.append("Hookup Reverse Polarity")
+
+    return ", ".join(msgs) if msgs else "OK"
+
+
+# ------- Controls ---------
+
+@formula("max_charge_current", "set_current_raw")
+def max_charge_current(raw):
+    return raw * 0.01 if raw is not None else None
+
+
+# ============================================================
+#  ARRAY AGGREGATES
+# ============================================================
+
+AGGREGATES: dict[str, Callable[[list], float]] = {
+    "min": min,
+    "max": max,
+    "delta": lambda values: max(values) - min(values),
+    "mean": lambda values: sum(values) / len(values),
+}
+
+
+def array_in_use(spec: dict, data: dict) -> list | None:
+    """An array spec's values, cut to its "length" key when that is known.
+
+    A length of 0 (no cells / probes fitted) gives an empty list; a length
+    beyond the array is clamped to it.
+    """
+    values = data.get(spec["key"])
+    if values is None:
+        return None
+    length = data.get(spec["array"].get("length"))
+    if isinstance(length, int):
+        return values[:max(min(length, len(values)), 0)]
+    return values
+
+
+# ============================================================
+#  FORMULA ENGINE
+# ============================================================
+
+class FormulaEngine:
+    """
+    Evaluates a profile's virtual sensors once per coordinator update.
+
+    The formulas needed by the profile (and the formulas they depend on)
+    are put in dependency order at setup, so each one runs exactly once
+    per update and shared intermediates like capacity_ah are reused.
+
+    Array specs are cut to the number of elements in use and reduced to
+    their aggregates ("<key>_<aggregate>") before the formulas run. Leading
+    elements named in the spec are published under their own keys (None
+    beyond the number in use).
+    """
+
+    def __init__(self, profile: dict):
+        raw_keys = {s["key"] for s in profile["sensors"]}
+        self.virtual_sensors = profile.get("virtual_sensors", [])
+        self.arrays = [s for s in profile["sensors"] if "array" in s]
+        self.order: list[str] = []
+
+        visiting: set[str] = set()
+
+        def visit(name: str):
+            if name in self.order or name not in FORMULAS:
+                return
+            if name in raw_keys:
+                raise ValueError(f"Formula '{name}' shadows a raw register key")
+            if name in visiting:
+                raise ValueError(f"Circular formula dependency at '{name}'")
+            visiting.add(name)
+            for dep in FORMULAS[name][1]:
+                visit(dep)
+            visiting.discard(name)
+            self.order.append(name)
+
+        for vcfg in self.virtual_sensors:
+            if vcfg["formula"] not in FORMULAS:
+                _LOGGER.warning(
+                    "Unknown formula '%s' for virtual sensor '%s'",
+                    vcfg["formula"], vcfg["key"]
+                )
+            visit(vcfg["formula"])
+
+        # virtual sensor key -> raw register keys it is computed from
+        self.inputs = {
+            vcfg["key"]: self._raw_inputs(vcfg["formula"]) for vcfg in self.virtual_sensors
+        }
+        for spec in self.arrays:
+            keys = {spec["key"], spec["array"].get("length")} - {None}
+            for aggregate in spec["array"].get("aggregates", ()):
+                self.inputs[f"{spec['key']}_{aggregate}"] = keys
+            for element in spec["array"].get("elements", ()):
+                self.inputs[element] = keys
+
+    def _raw_inputs(self, name: str) -> set[str]:
+        if name not in FORMULAS:
+            return {name}
+        keys = set()
+        for dep in FORMULAS[name][1]:
+            keys |= self._raw_inputs(dep)
+        return keys
+
+    def evaluate(self, data: dict) -> dict:
+        """Return {virtual sensor key: value} computed from raw data (and the cut arrays)."""
+        values = dict(data)
+        result = {}
+
+        for spec in self.arrays:
+            cells = array_in_use(spec, values)
+            values[spec["key"]] = result[spec["key"]] = cells
+            precision = spec["array"].get("precision")
+            for aggregate in spec["array"].get("aggregates", ()):
+                val = AGGREGATES[aggregate](cells) if cells else None
+                if precision is not None and val is not None:
+                    val = round(val, precision)
+                values[f"{spec['key']}_{aggregate}"] = result[f"{spec['key']}_{aggregate}"] = val
+            for index, element in enumerate(spec["array"].get("elements", ())):
+                val = cells[index] if cells and index < len(cells) else None
+                if precision is not None and val is not None:
+                    val = round(val, precision)
+                values[element] = result[element] = val
+
+        for name in self.order:
+            func, inputs = FORMULAS[name]
+            try:
+                values[name] = func(*(values.get(i) for i in inputs))
+            except Exception as e:
+                _LOGGER.error("Error computing formula '%s': %s", name, e)
+                values[name] = None
+
+        for vcfg in self.virtual_sensors:
+            val = values.get(vcfg["formula"]) if vcfg["formula"] in FORMULAS else None
+
+            # precision handling
+            precision = vcfg.get("precision")
+            if precision is not None and val is not None:
+                val = round(val, precision)
+
+            result[vcfg["key"]] = val
+
+        return result
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import logging
+
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, IDENTITY_STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def format_version(raw: int) -> str:
+    """Renogy version registers hold one byte per part: 0x00010203 -> V1.2.3."""
+    return f"V{(raw >> 16) & 0xFF}.{(raw >> 8) & 0xFF}.{raw & 0xFF}"
+
+
+def registry_fields(identity: dict, values: dict) -> dict:
+    """
+    Device registry fields for a profile's "identity" mapping.
+
+    ``identity`` maps registry fields (serial_number, sw_version,
+    hw_version) to data keys; fields whose value is unknown are left out.
+    """
+    fields = {}
+    for field, key in identity.items():
+        raw = values.get(key)
+        if raw is None:
+            continue
+        fields[field] = str(raw) if field == "serial_number" else format_version(raw)
+    return fields
+
+
+class IdentityStore:
+    """
+    Static registers of one config entry, persisted across restarts.
+
+    The product information registers never change, so after the first
+    successful read they are kept in Home Assistant's storage. On later
+    startups only the serial number is read back to check that the same
+    unit is still behind the gateway and slave id.
+    """
+
+    def __init__(self, hass, entry_id: str):
+        self._store = Store(hass, IDENTITY_STORAGE_VERSION, f"{DOMAIN}.identity.{entry_id}")
+        self._saved: dict | None = None
+
+    async def async_load(self) -> dict | None:
+        """Cached static values, or None if nothing was stored yet."""
+        data = await self._store.async_load()
+        self._saved = data.get("values") if data else None
+        return self._saved
+
+    async def async_save(self, values: dict) -> None:
+        """Persist the static values if they differ from what is stored."""
+        if values == self._saved:
+            return
+        self._saved = dict(values)
+        await self._store.async_save({"values": self._saved})
+
+    async def async_remove(self) -> None:
+        self._saved = None
+        await self._store.async_remove()
+
+
+def async_update_device_identity(hass, device_name: str, fields: dict) -> None:
+    """Write serial number and versions to the device registry entry."""
+    if not fields:
+        return
+    registry = dr.async_get(hass)
+    device = registry.async_get_device(identifiers={(DOMAIN, device_name)})
+    if device is None:
+        return
+    changes = {k: v for k, v in fields.items() if getattr(device, k, None) != v}
+    if changes:
+        _LOGGER.debug("%s: updating device registry %s", device_name, changes)
+        registry.async_update_device(device.id, **changes)
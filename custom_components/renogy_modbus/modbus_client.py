@@ -2,83 +2,348 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 
-from .vendor.pymodbus.client import AsyncModbusTcpClient
-from .vendor.pymodbus.exceptions import ModbusException
+from .const import CONNECT_TIMEOUT, RESPONSE_TIMEOUT_MAX, RESPONSE_TIMEOUT_MIN
+from .scheduler import PRIORITY_INTERACTIVE, BusScheduler
+from .stats import DeviceStats, WireStats
+from .vendor.pymodbus.client.tcp import AsyncModbusTcpClient
+from .vendor.pymodbus.exceptions import ModbusException, ModbusIOException
+from .vendor.pymodbus.pdu import ReadHoldingRegistersRequest
+from .vendor.pymodbus.transaction.rtt import RttEstimator
+from .vendor.pymodbus.transport import FrameTrace
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class RenogyModbusClient:
-    """Async Modbus TCP client using vendored pymodbus 3.11.4."""
+class RenogyModbusConnection:
+    """
+    One Modbus TCP socket to a gateway, shared by every slave behind it.
+
+    Requests from all slaves go through one BusScheduler, since the
+    gateway forwards them onto one RS485 bus anyway. Gateways that accept
+    several outstanding Modbus TCP transactions can opt into pipelining
+    with ``pipeline_depth`` > 1. With ``serial_baud`` (the RS485 side of a
+    TCP/RTU gateway) response timeouts grow with the frame length.
+    """
 
-    def __init__(self, host: str, port: int, slave: int):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        frame_gap: float = 0.0,
+        pipeline_depth: int = 1,
+        serial_baud: int = 0,
+    ):
         self._host = host
         self._port = port
-        self._slave = slave
         self._client: AsyncModbusTcpClient | None = None
-        self._lock = asyncio.Lock()
+        self._connect_lock = asyncio.Lock()
+        self._connect_failures = 0
+        self._connect_error: Exception | None = None
+        self.pipeline_depth = max(1, pipeline_depth)
+        # Seconds per byte at 8N1 (10 bits), 0 = frame length not known
+        self.byte_time = 10 / serial_baud if serial_baud else 0.0
+        self.scheduler = BusScheduler(
+            f"{host}:{port}",
+            frame_gap=frame_gap,
+            max_in_flight=self.pipeline_depth,
+        )
+
+        # Instrumentation: bytes on the socket, per-slave request stats and
+        # the last frames on the socket (kept across reconnects)
+        self.wire = WireStats()
+        self._stats: dict[int, DeviceStats] = {}
+        self.frame_trace = FrameTrace()
+
+        # Optional local Modbus TCP proxy; while it runs, every block read
+        # here also goes into its cache
+        self.proxy = None
+        self.cache = None
+
+    @property
+    def key(self) -> str:
+        """Pool key for this gateway."""
+        return f"{self._host}:{self._port}"
+
+    @property
+    def connected(self) -> bool:
+        """Return True if the socket is open."""
+        return self._client is not None and self._client.connected
+
+    @property
+    def response_timeout(self) -> dict | None:
+        """Round trip time estimate and current response timeout."""
+        return self._client.ctx.rtt.as_dict() if self._client else None
+
+    @property
+    def modbus_client(self) -> AsyncModbusTcpClient | None:
+        """Underlying pymodbus client (None before the first connect)."""
+        return self._client
+
+    def stats_for(self, slave: int) -> DeviceStats:
+        """Request statistics for one slave on this gateway."""
+        stats = self._stats.get(slave)
+        if stats is None:
+            stats = self._stats[slave] = DeviceStats()
+        return stats
 
     async def connect(self):
-        """Connect to the Modbus TCP device."""
-        _LOGGER.debug("Connecting to Modbus %s:%s", self._host, self._port)
+        """
+        Connect to the Modbus TCP gateway (no-op if already connected).
 
-        try:
-            # pymodbus 3.11.x uses keyword-only args for AsyncModbusTcpClient
-            self._client = AsyncModbusTcpClient(
-                host=self._host,
-                port=self._port,
-            )
+        Devices on one gateway connect concurrently; callers that waited
+        for somebody else's failed attempt share its error instead of
+        each waiting out another connect timeout.
+        """
+        failures = self._connect_failures
+        async with self._connect_lock:
+            if self.connected:
+                return
+            if self._connect_failures != failures:
+                raise ConnectionError(f"Modbus gateway {self.key} unreachable: {self._connect_error}")
 
-            await self._client.connect()
+            _LOGGER.debug("Connecting to Modbus %s:%s", self._host, self._port)
 
-            if not self._client.connected:
-                raise ConnectionError("Failed to connect to Modbus device")
+            try:
+                # pymodbus 3.11.x uses keyword-only args for AsyncModbusTcpClient
+                if self._client is None:
+                    self._client = AsyncModbusTcpClient(
+                        host=self._host,
+                        port=self._port,
+                        timeout=CONNECT_TIMEOUT,
+                        trace_packet=self.wire.trace_packet,
+                    )
+                    self._client.set_pipeline_depth(self.pipeline_depth)
+                    self._client.set_response_timeout(
+                        RESPONSE_TIMEOUT_MIN, RESPONSE_TIMEOUT_MAX, byte_time=self.byte_time
+                    )
+                    self._client.ctx.frame_trace = self.frame_trace
 
-            _LOGGER.info("Connected to Modbus device at %s:%s", self._host, self._port)
+                await self._client.connect()
 
-        except Exception as err:
-            _LOGGER.error("Modbus connection error: %s", err)
-            raise
+                if not self._client.connected:
+                    raise ConnectionError("Failed to connect to Modbus device")
+
+                _LOGGER.info("Connected to Modbus device at %s:%s", self._host, self._port)
+
+            except Exception as err:
+                _LOGGER.error("Modbus connection error: %s", err)
+                self._connect_failures += 1
+                self._connect_error = err
+                raise
+
+    async def async_start_proxy(self, host: str, port: int, ttl: float):
+        """Serve this gateway on a Modbus TCP address (no-op if already running)."""
+        if self.proxy is not None:
+            return
+        # Imported here: the server side of pymodbus is only loaded when used
+        from .proxy import RenogyModbusProxy
+
+        proxy = RenogyModbusProxy(self, port, ttl, host=host)
+        await proxy.start()
+        self.proxy = proxy
+        self.cache = proxy.cache
 
     async def close(self):
         """Close the connection."""
+        if self.proxy is not None:
+            await self.proxy.stop()
+            self.proxy = None
+            self.cache = None
+        await self.scheduler.close()
         if self._client:
-            await self._client.close()
-            _LOGGER.info("Closed Modbus connection")
+            self._client.close()
+            _LOGGER.info("Closed Modbus connection to %s", self.key)
             self._client = None
 
-    async def read_register(self, register: int, count: int = 1):
+    async def read_registers(
+        self,
+        slave: int,
+        register: int,
+        count: int = 1,
+        priority: int = PRIORITY_INTERACTIVE,
+    ):
         """
-        Read holding registers.
+        Read holding registers from one slave.
 
         Returns:
-            list[int] | None: list of register values, or None on error.
+            list[int] | None: list of register values, or None on error
+            (including a failed reconnect, so callers count it as a
+            failed block).
         """
-        if not self._client:
-            await self.connect()
-
-        async with self._lock:
+        if not self.connected:
             try:
-                # pymodbus 3.11.x uses 'unit' for the slave / unit id
-                resp = await self._client.read_holding_registers(
-                    address=register,
-                    count=count,
-                    device_id=self._slave,
-                )
-            except ModbusException as err:
-                _LOGGER.error("Modbus error on register %s: %s", register, err)
-                return None
-            except Exception as err:
-                _LOGGER.error("Unexpected Modbus error on register %s: %s", register, err)
+                await self.connect()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.debug("Read of slave %s register %s skipped, not connected: %s", slave, register, err)
                 return None
 
+        return await self.scheduler.submit(
+            slave, self._read_registers, slave, register, count, time.monotonic(),
+            priority=priority,
+        )
+
+    async def _read_registers(self, slave: int, register: int, count: int, queued: float):
+        """Perform the read once the scheduler gives us the bus."""
+        stats = self.stats_for(slave)
+        started = time.monotonic()
+        wait_ms = (started - queued) * 1000
+
+        try:
+            # pymodbus 3.11.x uses 'device_id' for the slave / unit id
+            resp = await self._client.read_holding_registers(
+                address=register,
+                count=count,
+                device_id=slave,
+            )
+        except ModbusIOException as err:
+            # No (valid) answer; counts the retries actually sent
+            stats.record_timeout(wait_ms, err.retries)
+            _LOGGER.error("Modbus error on slave %s register %s: %s", slave, register, err)
+            return None
+        except ModbusException as err:
+            stats.record_error(wait_ms)
+            _LOGGER.error("Modbus error on slave %s register %s: %s", slave, register, err)
+            return None
+        except Exception as err:
+            stats.record_error(wait_ms)
+            _LOGGER.error("Unexpected Modbus error on slave %s register %s: %s", slave, register, err)
+            return None
+
         if not resp or resp.isError():
-            _LOGGER.error("Bad Modbus response for register %s: %s", register, resp)
+            stats.record_error(wait_ms, resp.exception_code if resp else None)
+            _LOGGER.error("Bad Modbus response for slave %s register %s: %s", slave, register, resp)
             return None
 
+        stats.record_request((time.monotonic() - started) * 1000, wait_ms, resp.retries)
+        if self.cache is not None:
+            self.cache.store(slave, register, resp.registers)
         return resp.registers
 
+    async def probe(self, slave: int, register: int, rtt: RttEstimator):
+        """
+        Read one register from a slave id that may not exist (discovery).
+
+        Queued ahead of polling like any interactive request, but sent
+        once with the caller's own timeout estimate, which learns from the
+        ids that answer. A missing answer returns None without counting
+        against the connection, and is not recorded in the slave stats.
+
+        Returns:
+            the response PDU (data or exception response), or None.
+        """
+        if not self.connected:
+            await self.connect()
+
+        return await self.scheduler.submit(
+            slave, self._probe, slave, register, rtt,
+            priority=PRIORITY_INTERACTIVE,
+        )
+
+    async def _probe(self, slave: int, register: int, rtt: RttEstimator):
+        """Perform the probe once the scheduler gives us the bus."""
+        request = ReadHoldingRegistersRequest(address=register, count=1, dev_id=slave)
+        started = time.monotonic()
+        resp = await self._client.probe(request, rtt.timeout)
+        if resp is not None:
+            rtt.sample(time.monotonic() - started)
+        return resp
+
+    async def write_register(self, slave: int, register: int, value: int) -> bool:
+        """Write a single holding register on one slave (ahead of any queued polling)."""
+        if not self.connected:
+            try:
+                await self.connect()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error("Modbus write to slave %s at %s failed, not connected: %s", slave, register, err)
+                return False
+
+        return await self.scheduler.submit(
+            slave, self._write_register, slave, register, value,
+            priority=PRIORITY_INTERACTIVE,
+        )
+
+    async def _write_register(self, slave: int, register: int, value: int) -> bool:
+        """Perform the write once the scheduler gives us the bus."""
+        try:
+            resp = await self._client.write_registers(
+                address=register,
+                values=[value],
+                device_id=slave,
+            )
+        except ModbusException as err:
+            _LOGGER.error("Modbus write error on slave %s at %s: %s", slave, register, err)
+            return False
+        except Exception as err:
+            _LOGGER.error("Unexpected Modbus write error on slave %s at %s: %s", slave, register, err)
+            return False
+
+        if not resp or resp.isError():
+            _LOGGER.error("Bad Modbus write response for slave %s register %s: %s", slave, register, resp)
+            return False
+
+        return True
+
+
+class RenogyModbusClient:
+    """Async Modbus TCP client for one Renogy slave, using vendored pymodbus 3.11.4."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        slave: int,
+        connection: RenogyModbusConnection | None = None,
+    ):
+        self._host = host
+        self._port = port
+        self._slave = slave
+
+        # Without a shared connection the client owns a private socket
+        self._owns_connection = connection is None
+        self.connection = connection or RenogyModbusConnection(host, port)
+
+    @property
+    def slave(self) -> int:
+        """Modbus slave / device id."""
+        return self._slave
+
+    @property
+    def stats(self) -> DeviceStats:
+        """Request statistics for this slave."""
+        return self.connection.stats_for(self._slave)
+
+    async def connect(self):
+        """Connect to the Modbus TCP device."""
+        await self.connection.connect()
+
+    async def close(self):
+        """Close the connection if this client owns it."""
+        if self._owns_connection:
+            await self.connection.close()
+
+    async def read_register(
+        self,
+        register: int,
+        count: int = 1,
+        priority: int = PRIORITY_INTERACTIVE,
+    ):
+        """
+        Read holding registers.
+
+        Polling passes its tier's priority, anything else is interactive
+        and goes ahead of queued polling reads.
+
+        Returns:
+            list[int] | None: list of register values, or None on error.
+        """
+        return await self.connection.read_registers(self._slave, register, count, priority)
+
+    def cancel_queued_reads(self) -> int:
+        """Drop this slave's polling reads that are still waiting for the bus."""
+        return self.connection.scheduler.cancel_queued(self._slave)
+
     async def read_int(self, register: int) -> int | None:
         """Read a single register and return its integer value."""
         values = await self.read_register(register, 1)
@@ -97,25 +362,4 @@ class RenogyModbusClient:
         Returns:
             True if success, False otherwise.
         """
-        if not self._client:
-            await self.connect()
-
-        async with self._lock:
-            try:
-                resp = await self._client.write_registers(
-                    address=register,
-                    values=[value],
-                    device_id=self._slave,
-                )
-            except ModbusException as err:
-                _LOGGER.error("Modbus write error at %s: %s", register, err)
-                return False
-            except Exception as err:
-                _LOGGER.error("Unexpected Modbus write error at %s: %s", register, err)
-                return False
-
-        if not resp or resp.isError():
-            _LOGGER.error("Bad Modbus write response for register %s: %s", register, resp)
-            return False
-
-        return True
+        return await self.connection.write_register(self._slave, register, value)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass, field
+
+from .const import DEFAULT_MAX_GAP, MAX_READ_REGISTERS, POLL_FAST, POLL_SLOW, POLL_STATIC
+
+# struct codes and register widths of the supported register types
+TYPE_FORMATS = {"int16": "h", "uint16": "H", "int32": "i", "uint32": "I"}
+TYPE_REGISTERS = {"int16": 1, "uint16": 1, "int32": 2, "uint32": 2}
+
+
+def register_count(sensor: dict) -> int:
+    """Number of registers a spec occupies (explicit "count" or from its type and array size)."""
+    if "array" in sensor:
+        return sensor["array"]["count"] * TYPE_REGISTERS.get(sensor.get("type"), 1)
+    return sensor.get("count") or TYPE_REGISTERS.get(sensor.get("type"), 1)
+
+
+# ============================================================
+#  READ BLOCK
+# ============================================================
+
+@dataclass
+class ReadBlock:
+    """A contiguous range of holding registers fetched in one request."""
+
+    start: int
+    count: int
+    sensors: list[dict] = field(default_factory=list)
+
+    @property
+    def end(self) -> int:
+        """First register after this block."""
+        return self.start + self.count
+
+    @property
+    def poll(self) -> str:
+        """Most frequent poll tier among the block's specs."""
+        tiers = {sensor.get("poll", POLL_FAST) for sensor in self.sensors}
+        for tier in (POLL_FAST, POLL_SLOW):
+            if tier in tiers:
+                return tier
+        return POLL_STATIC
+
+    def compile(self) -> None:
+        """
+        Precompute the struct layout used to decode this block.
+
+        The whole block is unpacked in one ``struct.unpack_from`` call:
+        unused registers become pad bytes, 16/32-bit fields map to h/H/i/I.
+        32-bit values with "word_order": "little" (low word first) are
+        unpacked as two words and combined afterwards. Array specs repeat
+        their field "count" times and decode to a list.
+        """
+        fmt = ">"
+        fields = []
+        pos = self.start
+
+        for sensor in sorted(self.sensors, key=lambda s: s["register"]):
+            reg = sensor["register"]
+            if reg < pos:
+                raise ValueError(
+                    f"Overlapping register spec '{sensor['key']}' at 0x{reg:04X}"
+                )
+
+            reg_type = sensor.get("type", "uint16")
+            width = TYPE_REGISTERS.get(reg_type, 1)
+            swap = width == 2 and sensor.get("word_order", "big") == "little"
+            count = sensor["array"]["count"] if "array" in sensor else 0
+
+            fmt += "x" * (2 * (reg - pos))
+            fmt += ("HH" if swap else TYPE_FORMATS.get(reg_type, "H")) * max(count, 1)
+            fields.append((sensor["key"], swap, reg_type == "int32", sensor.get("scale"), count))
+            pos = reg + width * max(count, 1)
+
+        self._packer = struct.Struct(f">{self.count}H")
+        self._struct = struct.Struct(fmt)
+        self._fields = fields
+
+    def decode(self, registers: list[int]) -> dict:
+        """Decode a block response into scaled per-key values."""
+        raw = self._struct.unpack_from(self._packer.pack(*registers[:self.count]))
+
+        result = {}
+        i = 0
+        for key, swap, signed, scale, count in self._fields:
+            if count:
+                result[key] = _decode_array(raw, i, count, swap, signed, scale)
+                i += count * (2 if swap else 1)
+                continue
+
+            if swap:
+                value = raw[i] | (raw[i + 1] << 16)
+                if signed and value & 0x80000000:
+                    value -= 0x100000000
+                i += 2
+            else:
+                value = raw[i]
+                i += 1
+
+            if scale:
+                value = value * scale
+
+            result[key] = value
+
+        return result
+
+
+def _decode_array(raw: tuple, i: int, count: int, swap: bool, signed: bool, scale) -> list:
+    """Decode ``count`` consecutive fields starting at raw[i] into a list."""
+    if swap:
+        values = []
+        for j in range(i, i + 2 * count, 2):
+            value = raw[j] | (raw[j + 1] << 16)
+            if signed and value & 0x80000000:
+                value -= 0x100000000
+            values.append(value)
+    else:
+        values = list(raw[i : i + count])
+
+    if scale:
+        values = [value * scale for value in values]
+    return values
+
+
+# ============================================================
+#  PLANNER
+# ============================================================
+
+def build_read_plan(
+    sensors: list[dict],
+    max_gap: int = DEFAULT_MAX_GAP,
+    max_count: int = MAX_READ_REGISTERS,
+) -> list[ReadBlock]:
+    """
+    Group register specs into as few block reads as possible.
+
+    Two specs share a block when the number of unused registers between
+    them is at most ``max_gap`` and the merged block stays within
+    ``max_count`` registers (125 is the Modbus limit for function 3).
+    """
+    blocks: list[ReadBlock] = []
+
+    for sensor in sorted(sensors, key=lambda s: s["register"]):
+        start = sensor["register"]
+        end = start + register_count(sensor)
+
+        if blocks:
+            block = blocks[-1]
+            gap = start - block.end
+            if gap <= max_gap and max(end, block.end) - block.start <= max_count:
+                block.count = max(end, block.end) - block.start
+                block.sensors.append(sensor)
+                continue
+
+        blocks.append(ReadBlock(start=start, count=end - start, sensors=[sensor]))
+
+    for block in blocks:
+        block.compile()
+
+    return blocks
+
+
+def sensors_for_tiers(sensors: list[dict], tiers) -> list[dict]:
+    """Return the specs whose poll tier is in ``tiers``."""
+    return [s for s in sensors if s.get("poll", POLL_FAST) in tiers]
+
+
+def attach_covered(blocks: list[ReadBlock], sensors: list[dict]) -> None:
+    """
+    Add specs that already lie inside a planned block.
+
+    Their registers come back with the block anyway, so decoding them
+    every cycle costs no extra bus traffic.
+    """
+    for sensor in sensors:
+        start = sensor["register"]
+        end = start + register_count(sensor)
+        for block in blocks:
+            if block.start <= start and end <= block.end:
+                if sensor not in block.sensors:
+                    block.sensors.append(sensor)
+                    block.compile()
+                break
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from .const import DEFAULT_PROXY_HOST
+from .scheduler import PRIORITY_INTERACTIVE
+from .vendor.pymodbus.constants import ExcCodes
+from .vendor.pymodbus.datastore import ModbusBaseDeviceContext, ModbusServerContext
+from .vendor.pymodbus.exceptions import ModbusException, NoSuchIdException
+from .vendor.pymodbus.server.server import ModbusTcpServer
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# ============================================================
+#  BLOCK CACHE
+# ============================================================
+
+class BlockCache:
+    """
+    Register blocks last read from each slave on one gateway.
+
+    Every successful block read (coordinator polling and forwarded proxy
+    reads alike) is kept as read, keyed by slave and start address. A
+    proxy read is answered from the newest block that covers it, as long
+    as that block is younger than the slave's TTL: what its coordinator
+    set (see set_ttl), otherwise ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.ttls: dict[int, float] = {}
+        self._blocks: dict[int, dict[int, tuple[list[int], float]]] = {}
+
+    def set_ttl(self, slave: int, ttl: float):
+        """Serve the slave's blocks for ``ttl`` seconds (until it is polled again)."""
+        self.ttls[slave] = ttl
+
+    def ttl_for(self, slave: int) -> float:
+        return self.ttls.get(slave, self.ttl)
+
+    def store(self, slave: int, address: int, registers: list[int]):
+        self._blocks.setdefault(slave, {})[address] = (registers, time.monotonic())
+
+    def store_write(self, slave: int, address: int, values: list[int]):
+        """
+        Apply a successful write to the cached blocks it overlaps.
+
+        A write never adds a block of its own: the device may not read back
+        what was written (e.g. command registers), so only registers the
+        integration actually read are served from the cache.
+        """
+        blocks = self._blocks.get(slave, {})
+        end = address + len(values)
+        for start, (registers, stamp) in list(blocks.items()):
+            if start < end and address < start + len(registers):
+                patched = list(registers)
+                for i in range(max(address, start), min(end, start + len(registers))):
+                    patched[i - start] = values[i - address]
+                blocks[start] = (patched, stamp)
+
+    def lookup(self, slave: int, address: int, count: int) -> list[int] | None:
+        """Registers address..address+count-1 from a fresh block, or None."""
+        best = None
+        oldest = time.monotonic() - self.ttl_for(slave)
+        for start, (registers, stamp) in self._blocks.get(slave, {}).items():
+            if (
+                stamp >= oldest
+                and start <= address
+                and address + count <= start + len(registers)
+                and (best is None or stamp > best[1])
+            ):
+                best = (registers[address - start : address - start + count], stamp)
+        return best[0] if best else None
+
+
+# ============================================================
+#  SERVER DATASTORE
+# ============================================================
+
+class ProxyDeviceContext(ModbusBaseDeviceContext):
+    """Holding registers of one upstream slave: cache first, then the gateway."""
+
+    def __init__(self, proxy: RenogyModbusProxy, slave: int):
+        self.proxy = proxy
+        self.slave = slave
+
+    async def async_getValues(self, func_code, address, count=1):
+        if self.decode(func_code) != "h":
+            return ExcCodes.ILLEGAL_FUNCTION
+        return await self.proxy.read(self.slave, address, count)
+
+    async def async_setValues(self, func_code, address, values):
+        if self.decode(func_code) != "h":
+            return ExcCodes.ILLEGAL_FUNCTION
+        return await self.proxy.write(self.slave, func_code, address, values)
+
+
+class ProxyServerContext(ModbusServerContext):
+    """Every slave id maps to the same id behind the upstream gateway."""
+
+    def __init__(self, proxy: RenogyModbusProxy):
+        super().__init__(devices={}, single=False)
+        self._proxy = proxy
+
+    def __contains__(self, device_id):
+        return 0 <= device_id <= 0xF7
+
+    def __getitem__(self, device_id):
+        if not 0 <= device_id <= 0xF7:
+            raise NoSuchIdException(f"device_id - {device_id} is out of range")
+        context = self._devices.get(device_id)
+        if context is None:
+            context = self._devices[device_id] = ProxyDeviceContext(self._proxy, device_id)
+        return context
+
+
+# ============================================================
+#  PROXY
+# ============================================================
+
+class RenogyModbusProxy:
+    """
+    Local Modbus TCP server in front of one gateway connection.
+
+    Gateways that accept a single TCP client can be shared this way: other
+    consumers (the vendor app, logging scripts) connect to the proxy.
+    Holding register reads are answered from the block cache, which the
+    coordinators' polling keeps filled, while it is fresh. Misses and
+    writes are forwarded through the connection's bus scheduler like any
+    interactive request (queued polling reads may be cancelled, these must
+    not be), so they share the bus instead of opening a second socket.
+    Each downstream client keeps its own transaction ids: the server
+    answers with the id of the request, upstream requests use the
+    connection's own.
+    """
+
+    def __init__(self, connection, port: int, ttl: float, host: str = DEFAULT_PROXY_HOST):
+        self.connection = connection
+        self.port = port
+        self.host = host
+        self.cache = BlockCache(ttl)
+        self._server: ModbusTcpServer | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    async def start(self):
+        self._server = ModbusTcpServer(ProxyServerContext(self), address=(self.host, self.port))
+        await self._server.serve_forever(background=True)
+        _LOGGER.info("Modbus proxy for %s listening on %s:%d", self.connection.key, self.host, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            await self._server.shutdown()
+            self._server = None
+
+    # ------------------------------------------------------------
+    # Request path
+    # ------------------------------------------------------------
+    async def read(self, slave: int, address: int, count: int):
+        registers = self.cache.lookup(slave, address, count)
+        if registers is not None:
+            self.hits += 1
+            return registers
+
+        self.misses += 1
+        return await self._forward(slave, self._read, slave, address, count)
+
+    async def write(self, slave: int, func_code: int, address: int, values: list[int]):
+        self.writes += 1
+        return await self._forward(slave, self._write, slave, func_code, address, values)
+
+    async def _forward(self, slave: int, func, *args):
+        """Queue a request on the gateway's scheduler, mapping failures to exception codes."""
+        if not self.connection.connected:
+            try:
+                await self.connection.connect()
+            except Exception:  # pylint: disable=broad-except
+                self.errors += 1
+                return ExcCodes.GATEWAY_PATH_UNAVIABLE
+        return await self.connection.scheduler.submit(slave, func, *args, priority=PRIORITY_INTERACTIVE)
+
+    async def _read(self, slave: int, address: int, count: int):
+        try:
+            resp = await self.connection.modbus_client.read_holding_registers(
+                address=address, count=count, device_id=slave
+            )
+        except ModbusException as err:
+            _LOGGER.debug("Proxy read of slave %s register %s failed: %s", slave, address, err)
+            self.errors += 1
+            return ExcCodes.GATEWAY_NO_RESPONSE
+
+        if resp.isError():
+            self.errors += 1
+            return _exception_code(resp.exception_code)
+
+        self.cache.store(slave, address, resp.registers)
+        return resp.registers
+
+    async def _write(self, slave: int, func_code: int, address: int, values: list[int]):
+        client = self.connection.modbus_client
+        try:
+            # Keep the downstream function code: some devices only take fc 6
+            if func_code == 6:
+                resp = await client.write_register(address=address, value=values[0], device_id=slave)
+            else:
+                resp = await client.write_registers(address=address, values=values, device_id=slave)
+        except ModbusException as err:
+            _LOGGER.debug("Proxy write of slave %s register %s failed: %s", slave, address, err)
+            self.errors += 1
+            return ExcCodes.GATEWAY_NO_RESPONSE
+
+        if resp.isError():
+            self.errors += 1
+            return _exception_code(resp.exception_code)
+
+        self.cache.store_write(slave, address, values)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "host": self.host,
+            "port": self.port,
+            "ttl": self.cache.ttl,
+            "ttl_per_slave": dict(self.cache.ttls),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+        }
+
+
+def _exception_code(code: int) -> ExcCodes:
+    try:
+        return ExcCodes(code)
+    except ValueError:
+        return ExcCodes.DEVICE_FAILURE
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import time
+
+from .const import DEFAULT_PUBLISH
+
+
+class PublishPolicy:
+    """
+    Decides whether a sensor's new value is worth a state write.
+
+    Policy keys (from a sensor's "publish" entry in DEVICE_TYPES):
+        deadband      absolute change needed to publish a numeric value
+        relative      change needed as a fraction of the last published value
+        min_interval  seconds to hold back changes after a publish
+        max_interval  seconds after which the value is re-published anyway
+        always        publish every change immediately (state / alarm strings)
+
+    Numeric values are compared to the last *published* value, so slow
+    drift still gets published once it exceeds the deadband. Changes to or
+    from None (unavailable) and availability changes always go out. A change
+    held back only by min_interval sets ``flush_at``, the monotonic time at
+    which the entity should ask again so the change is not lost when no
+    further update arrives.
+    """
+
+    def __init__(self, cfg: dict | None = None):
+        cfg = {**DEFAULT_PUBLISH, **(cfg or {})}
+        self.deadband = cfg.get("deadband", 0)
+        self.relative = cfg.get("relative", 0)
+        self.min_interval = cfg.get("min_interval", 0)
+        self.max_interval = cfg.get("max_interval")
+        self.always = cfg.get("always", False)
+
+        self._published = False
+        self._last_value = None
+        self._last_available = None
+        self._last_time = 0.0
+        self.flush_at: float | None = None
+
+    def should_publish(self, value, available: bool = True) -> bool:
+        """Return True (and remember the value) if this update should be written."""
+        now = time.monotonic()
+        self.flush_at = None
+
+        if self._decide(value, available, now):
+            self._published = True
+            self._last_value = value
+            self._last_available = available
+            self._last_time = now
+            return True
+        return False
+
+    def _decide(self, value, available: bool, now: float) -> bool:
+        if not self._published or available != self._last_available:
+            return True
+
+        last = self._last_value
+        if value == last:
+            return self.max_interval is not None and now - self._last_time >= self.max_interval
+
+        if self.always or value is None or last is None:
+            return True
+
+        if self.max_interval is not None and now - self._last_time >= self.max_interval:
+            return True
+
+        changed = True
+        if isinstance(value, (int, float)) and isinstance(last, (int, float)):
+            threshold = max(self.deadband, self.relative * abs(last))
+            changed = abs(value - last) > threshold if threshold else True
+
+        if changed and now - self._last_time < self.min_interval:
+            self.flush_at = self._last_time + self.min_interval
+            return False
+
+        return changed
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+_LOGGER = logging.getLogger(__name__)
+
+# Length of the window bus utilisation is measured over (seconds)
+UTILISATION_WINDOW = 60.0
+
+# Request priorities, lowest value first: user-initiated reads and writes,
+# then fast-tier polling, then slow / static polling
+PRIORITY_INTERACTIVE = 0
+PRIORITY_FAST = 1
+PRIORITY_SLOW = 2
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_FAST, PRIORITY_SLOW)
+
+
+class BusScheduler:
+    """
+    Per-gateway request scheduler.
+
+    Every request for a gateway goes through one worker that puts them on
+    the bus, by default one at a time. Requests are queued by priority and
+    the highest priority with queued work always goes next, so a write
+    from a service call only waits for the request already on the bus.
+    Within a priority, slaves are served round-robin, one request each, so
+    a coordinator firing a whole burst cannot starve the other devices on
+    the bus. An optional inter-frame gap is kept between requests for
+    RS485 bridges that need bus idle time.
+
+    With ``max_in_flight`` > 1 (pipelined Modbus TCP) the worker keeps up
+    to that many requests outstanding, still dispatched in round-robin order.
+    """
+
+    def __init__(self, name: str, frame_gap: float = 0.0, max_in_flight: int = 1):
+        self.name = name
+        self.frame_gap = frame_gap
+        self.max_in_flight = max(1, max_in_flight)
+
+        # One queue per (priority, slave), and per priority the slaves with
+        # queued work in round-robin order
+        self._queues: dict[tuple[int, int], deque] = {}
+        self._ready: dict[int, deque[int]] = {priority: deque() for priority in PRIORITIES}
+        self._worker: asyncio.Task | None = None
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._tasks: set[asyncio.Task] = set()
+        self._in_flight = 0
+        self._last_done = 0.0
+
+        # Statistics
+        self._requests = 0
+        self._requests_per_slave: dict[int, int] = {}
+        self._cancelled = 0
+        self._service_total = 0.0
+        self._busy_since = 0.0
+        self._window_start = time.monotonic()
+        self._window_busy = 0.0
+        self._utilisation = 0.0
+
+    # ------------------------------------------------------------
+    # Request path
+    # ------------------------------------------------------------
+    async def submit(
+        self,
+        slave: int,
+        func: Callable[..., Awaitable],
+        *args,
+        priority: int = PRIORITY_INTERACTIVE,
+    ):
+        """Queue ``func(*args)`` for ``slave`` and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        queue = self._queues.setdefault((priority, slave), deque())
+        if not queue:
+            self._ready[priority].append(slave)
+        queue.append((future, func, args))
+
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+        return await future
+
+    async def _run(self):
+        """Drain the queues, one request per slave per turn."""
+        while any(self._ready.values()):
+            await self._slots.acquire()
+
+            # Keep the bus idle for the frame gap after the previous answer
+            if self.frame_gap and self._in_flight == 0:
+                idle = time.monotonic() - self._last_done
+                if idle < self.frame_gap:
+                    await asyncio.sleep(self.frame_gap - idle)
+
+            request = self._next()
+            if request is None:
+                self._slots.release()
+                continue
+
+            slave, future, func, args = request
+            self._start()
+            task = asyncio.get_running_loop().create_task(
+                self._execute(slave, future, func, args)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _next(self):
+        """Pop the next live request: highest priority first, round-robin within it."""
+        for priority, ready in self._ready.items():
+            while ready:
+                slave = ready.popleft()
+                queue = self._queues[(priority, slave)]
+                future, func, args = queue.popleft()
+                if queue:
+                    ready.append(slave)
+
+                # Skip requests whose caller gave up while queued
+                if not future.done():
+                    return slave, future, func, args
+        return None
+
+    def cancel_queued(self, slave: int, priorities=(PRIORITY_FAST, PRIORITY_SLOW)) -> int:
+        """
+        Drop the requests ``slave`` still has queued at ``priorities``.
+
+        Used when a new polling cycle starts: reads left over from the
+        previous one would only return values that are about to be read
+        again. Their callers get CancelledError. Returns the number of
+        requests dropped.
+        """
+        dropped = 0
+        for priority in priorities:
+            queue = self._queues.get((priority, slave))
+            if not queue:
+                continue
+            for future, _func, _args in queue:
+                if not future.done():
+                    future.cancel()
+                    dropped += 1
+            queue.clear()
+            self._ready[priority].remove(slave)
+
+        self._cancelled += dropped
+        return dropped
+
+    async def _execute(self, slave, future, func, args):
+        """Run one request and hand its outcome to the waiting caller."""
+        start = time.monotonic()
+        try:
+            result = await func(*args)
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            raise
+        except Exception as err:  # pylint: disable=broad-except
+            if not future.done():
+                future.set_exception(err)
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            self._finish(slave, time.monotonic() - start)
+            self._slots.release()
+
+    def _start(self):
+        """Mark the bus busy."""
+        if self._in_flight == 0:
+            self._busy_since = time.monotonic()
+        self._in_flight += 1
+
+    def _finish(self, slave: int, service: float):
+        """Account one completed request."""
+        now = time.monotonic()
+        self._in_flight -= 1
+        self._last_done = now
+
+        self._requests += 1
+        self._requests_per_slave[slave] = self._requests_per_slave.get(slave, 0) + 1
+        self._service_total += service
+
+        if self._in_flight == 0:
+            self._window_busy += now - self._busy_since
+
+        elapsed = now - self._window_start
+        if elapsed >= UTILISATION_WINDOW:
+            self._utilisation = min(1.0, self._window_busy / elapsed)
+            self._window_start = now
+            self._window_busy = 0.0
+
+    async def close(self):
+        """Cancel the worker and fail everything still queued."""
+        for task in [self._worker, *self._tasks]:
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self._tasks.clear()
+
+        for queue in self._queues.values():
+            for future, _func, _args in queue:
+                if not future.done():
+                    future.cancel()
+            queue.clear()
+        for ready in self._ready.values():
+            ready.clear()
+
+    # ------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------
+    @property
+    def pending(self) -> int:
+        """Number of requests waiting for the bus."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def pending_by_priority(self) -> dict[int, int]:
+        """Number of requests waiting for the bus per priority."""
+        counts = dict.fromkeys(PRIORITIES, 0)
+        for (priority, _slave), queue in self._queues.items():
+            counts[priority] += len(queue)
+        return counts
+
+    @property
+    def utilisation(self) -> float:
+        """Fraction of wall time the bus was busy (last full window)."""
+        if self._utilisation:
+            return self._utilisation
+        elapsed = time.monotonic() - self._window_start
+        return min(1.0, self._window_busy / elapsed) if elapsed > 0 else 0.0
+
+    @property
+    def mean_request_time(self) -> float | None:
+        """Average time from putting a request on the bus to its answer (seconds)."""
+        if not self._requests:
+            return None
+        return self._service_total / self._requests
+
+    def devices_per_bus(self, requests_per_cycle: int, poll_interval: float) -> int | None:
+        """How many devices with this request load fit on the bus at a poll rate."""
+        mean = self.mean_request_time
+        if mean is None or requests_per_cycle <= 0:
+            return None
+        per_device = requests_per_cycle * (mean / self.max_in_flight + self.frame_gap)
+        return int(poll_interval / per_device) if per_device > 0 else None
+
+    def stats(self) -> dict:
+        """Snapshot of scheduler statistics."""
+        return {
+            "requests": self._requests,
+            "requests_per_slave": dict(self._requests_per_slave),
+            "pending": self.pending,
+            "pending_by_priority": self.pending_by_priority(),
+            "cancelled": self._cancelled,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "utilisation": round(self.utilisation, 4),
+            "mean_request_time": self.mean_request_time,
+            "frame_gap": self.frame_gap,
+        }
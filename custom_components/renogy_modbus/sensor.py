@@ -1,300 +1,242 @@
 from __future__ import annotations
 
 import logging
-from homeassistant.components.sensor import SensorEntity
+import time
+
+from homeassistant.components.sensor import RestoreSensor, SensorEntity
+from homeassistant.core import Event, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity import EntityCategory
 
-from .const import DOMAIN
+from .const import ARRAY_AGGREGATES, DOMAIN, LINK_SENSORS
+from .publish import PublishPolicy
 
 _LOGGER = logging.getLogger(__name__)
 
 # ============================================================
-#  COMMON UTILITY FORMULAS (used by Smart Battery)
+#  HELD-BACK CHANGES
 # ============================================================
 
-def combine_capacity(reg1, reg2):
-    """Renogy special 32-bit capacity combine."""
-    if reg1 is None or reg2 is None:
-        return None
-    raw = reg1 * 32768 + (reg2 // 2)
-    return raw * 0.002
-
-
-def percentage(cap, maxcap):
-    if cap is None or maxcap is None or maxcap == 0:
-        return None
-    pct = (cap / maxcap) * 100
-    return max(0, min(100, pct))
-
-
-def wattage(voltage, current):
-    if current is None or voltage is None:
-        return None
-    return current * voltage
-
-
-def remaining_wh(capacity_ah, voltage):
-    if capacity_ah is None or voltage is None:
-        return None
-    return capacity_ah * voltage
+class _PublishFlushMixin:
+    """Write a change held back by the publish policy's min_interval later on."""
 
+    _flush_unsub = None
 
-def average_temp(t1, t2, t3, t4):
-    values = [v for v in [t1, t2, t3, t4] if v is not None]
-    return (sum(values) / len(values)) if values else None
+    @callback
+    def _async_schedule_flush(self) -> None:
+        self._async_cancel_flush()
+        if self._publish.flush_at is not None:
+            delay = max(self._publish.flush_at - time.monotonic(), 0)
+            self._flush_unsub = async_call_later(self.hass, delay, self._async_flush)
 
+    @callback
+    def _async_flush(self, _now) -> None:
+        self._flush_unsub = None
+        self._handle_coordinator_update()
 
-def charging_state(current):
-    if current is None:
-        return None
-    if current < 0:
-        return "Discharging"
-    if current > 0:
-        return "Charging"
-    return "Idle"
+    @callback
+    def _async_cancel_flush(self) -> None:
+        if self._flush_unsub is not None:
+            self._flush_unsub()
+            self._flush_unsub = None
 
 
 # ============================================================
-#  DC-DC CHARGER FORMULA ENGINE
+#  COORDINATOR DATA ENTITY BASE
 # ============================================================
 
-def rated_voltage(d):
-    raw = d.get("rated_voltage_raw")
-    return raw // 256 if raw is not None else None
-
-
-def rated_current(d):
-    raw = d.get("rated_voltage_raw")
-    return raw % 256 if raw is not None else None
-
-
-def batt_soc(d):
-    return d.get("batt_soc_raw")
-
-
-def batt_voltage(d):
-    raw = d.get("batt_voltage_raw")
-    return raw * 0.1 if raw is not None else None
-
-
-def batt_current(d):
-    raw = d.get("batt_current_raw")
-    return raw * 0.01 if raw is not None else None
-
-
-def temp_internal(d):
-    raw = d.get("temp_packed_raw")
-    return raw // 256 if raw is not None else None
-
-
-def temp_probe(d):
-    raw = d.get("temp_packed_raw")
-    return raw % 256 if raw is not None else None
-
-
-def alt_voltage(d):
-    raw = d.get("alt_voltage_raw")
-    return raw * 0.1 if raw is not None else None
-
-
-def alt_current(d):
-    raw = d.get("alt_current_raw")
-    return raw * 0.01 if raw is not None else None
-
-
-def alt_power(d):
-    return d.get("alt_power_raw")
+class _RenogyDataSensor(_PublishFlushMixin, CoordinatorEntity, RestoreSensor):
+    """
+    A value from the coordinator's data, written through its publish policy.
 
+    Shows the restored last value until the first update and flags values
+    that the last cycle could not re-read in time.
+    """
 
-def pv_voltage(d):
-    raw = d.get("pv_voltage_raw")
-    return raw * 0.1 if raw is not None else None
-
+    def __init__(self, coordinator, device_name, key, cfg):
+        super().__init__(coordinator)
+        self._key = key
+        self._cfg = cfg
+        self._dev_name = device_name
 
-def pv_current(d):
-    raw = d.get("pv_current_raw")
-    return raw * 0.01 if raw is not None else None
+        self._attr_name = f"{device_name} {cfg['name']}"
+        self._attr_unique_id = f"{device_name}_{key}"
+        self._attr_native_unit_of_measurement = cfg.get("unit")
 
+        self._publish = PublishPolicy(cfg.get("publish"))
+        self._was_stale = False
+        self._restored = None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self._async_cancel_flush)
+        # Last known value, shown until the device answers for the first time
+        if (last := await self.async_get_last_sensor_data()) is not None:
+            self._restored = last.native_value
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when the publish policy says it changed enough."""
+        stale = self._key in self.coordinator.stale
+        publish = self._publish.should_publish(self.native_value, self.available)
+        changed = self._attributes_changed()
+        if publish or changed or stale != self._was_stale:
+            self._was_stale = stale
+            self.async_write_ha_state()
+        self._async_schedule_flush()
+
+    def _attributes_changed(self) -> bool:
+        """Return True if attributes other than staleness need a state write."""
+        return False
 
-def pv_power(d):
-    v = pv_voltage(d)
-    c = pv_current(d)
-    if v is None or c is None:
-        return None
-    return v * c
+    @property
+    def extra_state_attributes(self):
+        if self.coordinator.data is None:
+            return {"restored": True} if self._restored is not None else None
+        # Set when the last cycle ran out of time before this value was re-read
+        age = self.coordinator.stale.get(self._key)
+        return {"stale_seconds": age} if age is not None else None
 
+    @property
+    def data_key(self) -> str:
+        """Coordinator data key this entity shows."""
+        return self._key
 
-def energy_today(d):
-    return d.get("energy_today_raw")
+    @property
+    def native_value(self):
+        if self.coordinator.data is None:
+            return self._restored
+        return self.coordinator.data.get(self._key)
 
+    @property
+    def device_info(self):
+        return {
+            "identifiers": {(DOMAIN, self._dev_name)},
+            "name": self._dev_name,
+            "manufacturer": "Renogy",
+            "model": self.coordinator.profile.get("name", "Renogy Device"),
+        }
 
-def energy_total(d):
-    return d.get("energy_total_raw")
 
+# ============================================================
+#  RAW SENSOR ENTITY
+# ============================================================
 
-def charger_state(d):
-    raw = d.get("state_raw")
-    mapping = {
-        0: "Not Charging",
-        2: "MPPT Charging",
-        3: "Equalization",
-        4: "Boost Charging",
-        5: "Float Charging",
-        6: "Current Limited",
-        8: "Direct Charging",
-    }
-    return mapping.get(raw, f"Unknown ({raw})")
+class RenogyRawSensor(_RenogyDataSensor):
+    """Representation of a raw Modbus register (scaled by coordinator)."""
 
+    def __init__(self, coordinator, device_name, key, cfg):
+        super().__init__(coordinator, device_name, key, cfg)
 
-def alarms(d):
-    a = d.get("alarm_a_raw", 0)
-    b = d.get("alarm_b_raw", 0)
-    msgs = []
+        if cfg.get("category") == "diagnostic":
+            self._attr_entity_category = EntityCategory.DIAGNOSTIC
 
-    # Alarm A
-    if a & (1 << 4): msgs.append("Controller Inside Over Temp")
-    if a & (1 << 5): msgs.append("Alternator Input Over Current")
-    if a & (1 << 8): msgs.append("Alternator Input Over Voltage")
-    if a & (1 << 9): msgs.append("Starter Battery Reverse Polarity")
-    if a & (1 << 10): msgs.append("BMS Over Charge Protection")
-    if a & (1 << 11): msgs.append("Low Temperature Cutoff")
 
-    # Alarm B
-    if b & (1 << 1): msgs.append("Battery Over Discharged")
-    if b & (1 << 2): msgs.append("Battery Over Charged")
-    if b & (1 << 5): msgs.append("Controller Inside Temp Too High")
-    if b & (1 << 6): msgs.append("Battery Over Temp")
-    if b & (1 << 7): msgs.append("Hookup Input Too High")
-    if b & (1 << 10): msgs.append("Hookup Input Over Voltage")
-    if b & (1 << 12): msgs.append("Hookup Reverse Polarity")
+# ============================================================
+#  VIRTUAL SENSOR ENTITY
+# ============================================================
 
-    return ", ".join(msgs) if msgs else "OK"
+class RenogyVirtualSensor(_RenogyDataSensor):
+    """
+    Representation of a computed / derived sensor.
 
-def max_charge_current(d):
-    raw = d.get("set_current_raw")  # your original raw register
-    return raw * 0.01 if raw is not None else None
+    Its value is computed once per update by the coordinator's formula
+    engine and read from the coordinator's data like a raw register.
+    """
 
 
 # ============================================================
-#  FORMULA MAP (Smart Battery + DCDC)
+#  ARRAY AGGREGATE AND ELEMENT ENTITIES
 # ============================================================
 
-FORMULAS = {
-    # Smart battery
-    "capacity_ah": lambda d: combine_capacity(d.get("cap_reg1"), d.get("cap_reg2")),
-    "max_capacity_ah": lambda d: combine_capacity(d.get("maxcap_reg1"), d.get("maxcap_reg2")),
-    "percentage": lambda d: percentage(
-        combine_capacity(d.get("cap_reg1"), d.get("cap_reg2")),
-        combine_capacity(d.get("maxcap_reg1"), d.get("maxcap_reg2")),
-    ),
-    "wattage": lambda d: wattage(d.get("voltage"), d.get("current")),
-    "remaining_wh": lambda d: remaining_wh(
-        combine_capacity(d.get("cap_reg1"), d.get("cap_reg2")),
-        d.get("voltage")
-    ),
-    "average_temp": lambda d: average_temp(d.get("temp1"), d.get("temp2"), d.get("temp3"), d.get("temp4")),
-    "charging_state": lambda d: charging_state(d.get("current")),
-
-    # DC-DC charger formulas
-    "rated_voltage": rated_voltage,
-    "rated_current": rated_current,
-    "batt_soc": batt_soc,
-    "batt_voltage": batt_voltage,
-    "batt_current": batt_current,
-    "temp_internal": temp_internal,
-    "temp_probe": temp_probe,
-    "alt_voltage": alt_voltage,
-    "alt_current": alt_current,
-    "alt_power": alt_power,
-    "pv_voltage": pv_voltage,
-    "pv_current": pv_current,
-    "pv_power": pv_power,
-    "energy_today": energy_today,
-    "energy_total": energy_total,
-    "charger_state": charger_state,
-    "alarms": alarms,
-
-    # Controls
-    "max_charge_current": max_charge_current,
-
-}
+class RenogyArraySensor(RenogyVirtualSensor):
+    """One aggregate (min / max / delta / mean) of an array register spec."""
 
+    def __init__(self, coordinator, device_name, spec, aggregate):
+        cfg = {
+            "name": f"{spec['name']} {ARRAY_AGGREGATES[aggregate]}",
+            "unit": spec.get("unit"),
+            "publish": spec.get("publish"),
+        }
+        super().__init__(coordinator, device_name, f"{spec['key']}_{aggregate}", cfg)
 
+        if spec.get("category") == "diagnostic":
+            self._attr_entity_category = EntityCategory.DIAGNOSTIC
 
-# ============================================================
-#  RAW SENSOR ENTITY
-# ============================================================
+        # The per-element values ride along on one aggregate of the array
+        self._array_key = spec["key"] if spec["array"].get("attribute") == aggregate else None
+        self._precision = spec["array"].get("precision")
+        self._cells = None
 
-class RenogyRawSensor(CoordinatorEntity, SensorEntity):
-    """Representation of a raw Modbus register (scaled by coordinator)."""
+    def _current_cells(self) -> list | None:
+        if self._array_key is None or self.coordinator.data is None:
+            return None
+        cells = self.coordinator.data.get(self._array_key)
+        if cells is None or self._precision is None:
+            return cells
+        return [round(cell, self._precision) for cell in cells]
+
+    def _attributes_changed(self) -> bool:
+        # A single cell can move while the aggregate stays put
+        cells = self._current_cells()
+        if cells == self._cells:
+            return False
+        self._cells = cells
+        return True
 
-    def __init__(self, coordinator, device_name, key, cfg):
-        super().__init__(coordinator)
-        self._key = key
-        self._cfg = cfg
-        self._dev_name = device_name
+    @property
+    def extra_state_attributes(self):
+        attrs = super().extra_state_attributes
+        cells = self._current_cells()
+        if cells is None:
+            return attrs
+        return {**(attrs or {}), "cells": cells}
 
-        self._attr_name = f"{device_name} {cfg['name']}"
-        self._attr_unique_id = f"{device_name}_{key}"
-        self._attr_native_unit_of_measurement = cfg.get("unit")
 
-        if cfg.get("category") == "diagnostic":
-            self._attr_entity_category = EntityCategory.DIAGNOSTIC
+class RenogyArrayElementSensor(RenogyVirtualSensor):
+    """One named element of an array register spec (see its "elements" key)."""
 
-    @property
-    def native_value(self):
-        return self.coordinator.data.get(self._key)
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
 
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, self._dev_name)},
-            "name": self._dev_name,
-            "manufacturer": "Renogy",
-            "model": self.coordinator.profile.get("name", "Renogy Device"),
+    def __init__(self, coordinator, device_name, spec, index, key):
+        cfg = {
+            "name": f"{spec['name']} {index + 1}",
+            "unit": spec.get("unit"),
+            "publish": spec.get("publish"),
         }
+        super().__init__(coordinator, device_name, key, cfg)
 
 
 # ============================================================
-#  VIRTUAL SENSOR ENTITY
+#  LINK STATISTICS ENTITY
 # ============================================================
 
-class RenogyVirtualSensor(CoordinatorEntity, SensorEntity):
-    """Representation of a computed / derived sensor."""
+class RenogyLinkSensor(CoordinatorEntity, SensorEntity):
+    """Request timing / error statistics for the device's Modbus link."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
 
     def __init__(self, coordinator, device_name, key, cfg):
         super().__init__(coordinator)
         self._key = key
-        self._cfg = cfg
         self._dev_name = device_name
 
         self._attr_name = f"{device_name} {cfg['name']}"
-        self._attr_unique_id = f"{device_name}_{key}"
+        self._attr_unique_id = f"{device_name}_link_{key}"
         self._attr_native_unit_of_measurement = cfg.get("unit")
 
     @property
-    def native_value(self):
-        d = self.coordinator.data
-        formula = self._cfg["formula"]
-
-        try:
-            func = FORMULAS.get(formula)
-            if not func:
-                return None
-
-            val = func(d)
-
-            # precision handling
-            precision = self._cfg.get("precision")
-            if precision is not None and val is not None:
-                val = round(val, precision)
+    def available(self):
+        # Statistics stay meaningful while the device itself is unreachable
+        return True
 
-            return val
-
-        except Exception as e:
-            _LOGGER.error("Error computing virtual sensor '%s': %s", self._key, e)
-            return None
+    @property
+    def native_value(self):
+        return self.coordinator.link_stats.get(self._key)
 
     @property
     def device_info(self):
@@ -318,12 +260,50 @@ async def async_setup_entry(hass, entry, async_add_entities):
     profile = data["profile"]
     device_name = entry.data["name"]
 
-    entities = []
+    # Entities backed by coordinator data (as opposed to link statistics)
+    data_entities = []
 
     for sensor_cfg in profile["sensors"]:
-        entities.append(RenogyRawSensor(coordinator, device_name, sensor_cfg["key"], sensor_cfg))
+        if "array" in sensor_cfg:
+            for aggregate in sensor_cfg["array"].get("aggregates", ()):
+                data_entities.append(RenogyArraySensor(coordinator, device_name, sensor_cfg, aggregate))
+            for index, key in enumerate(sensor_cfg["array"].get("elements", ())):
+                data_entities.append(RenogyArrayElementSensor(coordinator, device_name, sensor_cfg, index, key))
+            continue
+        data_entities.append(RenogyRawSensor(coordinator, device_name, sensor_cfg["key"], sensor_cfg))
 
     for vcfg in profile.get("virtual_sensors", []):
-        entities.append(RenogyVirtualSensor(coordinator, device_name, vcfg["key"], vcfg))
+        data_entities.append(RenogyVirtualSensor(coordinator, device_name, vcfg["key"], vcfg))
+
+    entities = list(data_entities)
+    for lcfg in LINK_SENSORS:
+        entities.append(RenogyLinkSensor(coordinator, device_name, lcfg["key"], lcfg))
 
     async_add_entities(entities)
+
+    # Only the registers behind enabled entities are polled
+    @callback
+    def async_update_enabled_keys() -> None:
+        registry = er.async_get(hass)
+        keys = set()
+        for entity in data_entities:
+            entity_id = registry.async_get_entity_id("sensor", DOMAIN, entity.unique_id)
+            reg_entry = registry.async_get(entity_id) if entity_id else None
+            # Not registered yet: enabled unless the entity says otherwise
+            if reg_entry is not None:
+                enabled = reg_entry.disabled_by is None
+            else:
+                enabled = entity.entity_registry_enabled_default
+            if enabled:
+                keys.add(entity.data_key)
+        coordinator.set_enabled_keys(keys)
+
+    @callback
+    def async_registry_updated(event: Event) -> None:
+        if event.data["action"] == "update" and "disabled_by" in event.data.get("changes", {}):
+            async_update_enabled_keys()
+
+    async_update_enabled_keys()
+    entry.async_on_unload(
+        hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, async_registry_updated)
+    )
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+
+# Upper bucket bounds in milliseconds; the last bucket catches everything above
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram.
+
+    Recording is one bisect and two additions, so it is cheap enough to
+    sit on every request. Percentiles are estimated from the bucket bounds.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, pct: float) -> float | None:
+        """Upper bound of the bucket holding the given percentile (capped at max)."""
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return float(min(bound, round(self.max, 2)))
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean, 2) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": round(self.max, 2),
+            "buckets_ms": {
+                **{f"<={b}": c for b, c in zip(self.buckets, self.counts)},
+                f">{self.buckets[-1]}": self.counts[-1],
+            },
+        }
+
+
+class DeviceStats:
+    """
+    Request counters and latency histograms for one Modbus slave.
+
+    rtt          time from handing a request to pymodbus until the answer
+    queue_wait   time a request waited in the bus scheduler
+    cycle        duration of a coordinator polling cycle
+    blocks       latency per planned register block (queueing included)
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.exception_responses: dict[int, int] = {}
+
+        self.rtt = Histogram()
+        self.queue_wait = Histogram()
+        self.cycle = Histogram()
+        self.blocks: dict[str, Histogram] = {}
+
+    def record_request(self, rtt_ms: float, wait_ms: float, retries: int = 0):
+        self.requests += 1
+        self.retries += retries
+        self.rtt.record(rtt_ms)
+        self.queue_wait.record(wait_ms)
+
+    def record_timeout(self, wait_ms: float, retries: int):
+        self.requests += 1
+        self.errors += 1
+        self.timeouts += 1
+        self.retries += retries
+        self.queue_wait.record(wait_ms)
+
+    def record_error(self, wait_ms: float, exception_code: int | None = None):
+        self.requests += 1
+        self.errors += 1
+        if exception_code is not None:
+            self.exception_responses[exception_code] = (
+                self.exception_responses.get(exception_code, 0) + 1
+            )
+        self.queue_wait.record(wait_ms)
+
+    def record_block(self, block: str, latency_ms: float):
+        hist = self.blocks.get(block)
+        if hist is None:
+            hist = self.blocks[block] = Histogram()
+        hist.record(latency_ms)
+
+    @property
+    def error_rate(self) -> float | None:
+        return self.errors / self.requests if self.requests else None
+
+    def summary(self) -> dict:
+        """Flat values backing the diagnostic sensors."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "error_rate": round(self.error_rate * 100, 2) if self.requests else None,
+            "rtt_mean": round(self.rtt.mean, 1) if self.rtt.count else None,
+            "rtt_p95": self.rtt.percentile(95),
+            "queue_wait_mean": round(self.queue_wait.mean, 1) if self.queue_wait.count else None,
+            "cycle_mean": round(self.cycle.mean, 1) if self.cycle.count else None,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            **self.summary(),
+            "exception_responses": dict(self.exception_responses),
+            "rtt": self.rtt.as_dict(),
+            "queue_wait": self.queue_wait.as_dict(),
+            "cycle": self.cycle.as_dict(),
+            "blocks": {name: hist.as_dict() for name, hist in self.blocks.items()},
+        }
+
+
+class WireStats:
+    """
+    Bytes and frames on one gateway socket, fed by pymodbus' trace_packet hook.
+
+    Received bytes are counted per receive callback; a frame split across
+    TCP segments is counted again when its tail arrives, which is rare on
+    a LAN with frames this small.
+    """
+
+    def __init__(self):
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.frames_sent = 0
+
+    def trace_packet(self, sending: bool, data: bytes) -> bytes:
+        if sending:
+            self.bytes_sent += len(data)
+            self.frames_sent += 1
+        else:
+            self.bytes_received += len(data)
+        return data
+
+    def as_dict(self) -> dict:
+        return {
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "frames_sent": self.frames_sent,
+        }
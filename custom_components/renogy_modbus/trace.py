@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import struct
+from datetime import datetime, timezone
+
+from .vendor.pymodbus.transport import FrameTrace
+
+# Synthetic endpoints for the pcap export. The gateway side uses port 502
+# so Wireshark dissects the stream as Modbus/TCP whatever the real port is.
+PCAP_CLIENT = (bytes((10, 0, 0, 1)), 49152)
+PCAP_GATEWAY = (bytes((10, 0, 0, 2)), 502)
+
+LINKTYPE_RAW = 101
+TCP_SYN = 0x02
+TCP_ACK = 0x10
+TCP_PSH_ACK = 0x18
+
+
+def trace_as_json(trace: FrameTrace) -> list[dict]:
+    """Recorded frames as JSON-friendly dicts, oldest first."""
+    return [
+        {
+            "time": datetime.fromtimestamp(stamp, timezone.utc).isoformat(timespec="microseconds"),
+            "direction": "tx" if sending else "rx",
+            "data": data.hex(" "),
+        }
+        for stamp, sending, data in trace.frames()
+    ]
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def _packet(src, dst, seq: int, ack: int, flags: int, payload: bytes, ident: int) -> bytes:
+    """IPv4 + TCP packet carrying payload."""
+    tcp = struct.pack("!HHIIBBHHH", src[1], dst[1], seq, ack, 5 << 4, flags, 65535, 0, 0)
+    pseudo = src[0] + dst[0] + struct.pack("!BBH", 0, 6, len(tcp) + len(payload))
+    tcp = tcp[:16] + struct.pack("!H", _checksum(pseudo + tcp + payload)) + tcp[18:]
+
+    total = 20 + len(tcp) + len(payload)
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, total, ident, 0x4000, 64, 6, 0, src[0], dst[0])
+    ip = ip[:10] + struct.pack("!H", _checksum(ip)) + ip[12:]
+    return ip + tcp + payload
+
+
+def trace_as_pcap(trace: FrameTrace) -> bytes:
+    """
+    Recorded frames as a pcap file of one synthetic TCP connection.
+
+    The connection starts with a handshake at the first frame, after that
+    every sent or received packet becomes one segment with consistent
+    sequence numbers, so Wireshark reassembles frames split across reads.
+    """
+    frames = trace.frames()
+    out = [struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, LINKTYPE_RAW)]
+
+    def write(stamp: float, packet: bytes):
+        seconds = int(stamp)
+        out.append(struct.pack("<IIII", seconds, int((stamp - seconds) * 1e6), len(packet), len(packet)))
+        out.append(packet)
+
+    if not frames:
+        return out[0]
+
+    seq = {True: 1000, False: 5000}  # next sequence number per direction (True = sent)
+    start = frames[0][0]
+    write(start, _packet(PCAP_CLIENT, PCAP_GATEWAY, seq[True] - 1, 0, TCP_SYN, b"", 0))
+    write(start, _packet(PCAP_GATEWAY, PCAP_CLIENT, seq[False] - 1, seq[True], TCP_SYN | TCP_ACK, b"", 0))
+    write(start, _packet(PCAP_CLIENT, PCAP_GATEWAY, seq[True], seq[False], TCP_ACK, b"", 1))
+
+    for ident, (stamp, sending, data) in enumerate(frames, start=2):
+        src, dst = (PCAP_CLIENT, PCAP_GATEWAY) if sending else (PCAP_GATEWAY, PCAP_CLIENT)
+        write(stamp, _packet(src, dst, seq[sending], seq[not sending], TCP_PSH_ACK, data, ident & 0xFFFF))
+        seq[sending] = (seq[sending] + len(data)) & 0xFFFFFFFF
+
+    return b"".join(out)
@@ -0,0 +1,59 @@
+"""
+Import helpers for the developer tools.
+
+The integration's ``__init__`` needs Home Assistant, but most of its
+modules (const, planner, formulas, scheduler, the Modbus client) do not.
+``load()`` registers the integration directory as the package
+``renogy_modbus`` without running ``__init__``, so the tools can import
+those modules directly. The integration uses its vendored pymodbus as
+``renogy_modbus.vendor.pymodbus``; the vendor directory is also put on
+sys.path so tools that only need pymodbus (the emulator's server) can
+import it as ``pymodbus``.
+"""
+from __future__ import annotations
+
+import subprocess
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+INTEGRATION = ROOT / "custom_components" / "renogy_modbus"
+PACKAGE = "renogy_modbus"
+
+
+def load() -> types.ModuleType:
+    """Make ``renogy_modbus.<module>`` and ``pymodbus`` importable."""
+    vendor = str(INTEGRATION / "vendor")
+    if vendor not in sys.path:
+        sys.path.insert(0, vendor)
+
+    pkg = sys.modules.get(PACKAGE)
+    if pkg is None:
+        pkg = types.ModuleType(PACKAGE)
+        pkg.__path__ = [str(INTEGRATION)]
+        sys.modules[PACKAGE] = pkg
+    return pkg
+
+
+def git_revision() -> str | None:
+    """Short commit hash of the working tree, for benchmark reports."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_ids(text: str) -> list[int]:
+    """Parse a slave id list like ``1-10,12,20-22``."""
+    ids: list[int] = []
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        if "-" in part:
+            first, last = (int(x) for x in part.split("-", 1))
+            ids.extend(range(first, last + 1))
+        else:
+            ids.append(int(part))
+    return ids
@@ -0,0 +1,302 @@
+"""
+Polling pipeline benchmark.
+
+Runs RenogyModbusClient + RenogyCoordinator (block reads, decoding and
+formula evaluation) for N devices on one gateway against the emulator,
+for every combination of device count and poll interval, and prints a
+JSON report:
+
+    python tools/benchmark.py                              # 1/10/50 devices, 5 s
+    python tools/benchmark.py --devices 1,10,50 --intervals 1,5 --duration 30 \\
+        --latency 10 --output bench.json
+
+Per scenario it reports requests per device update, update wall time,
+CPU time per update, allocations per update, event-loop lag and bus
+utilisation. The emulator runs in a child process so CPU, allocation and
+loop-lag figures only cover the integration side; the lag probe's own
+CPU use is measured while idle and subtracted.
+
+Needs Home Assistant importable (the coordinator is a DataUpdateCoordinator);
+updates are driven directly, without a running Home Assistant instance.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+if __package__ in (None, ""):
+    import _integration
+else:
+    from . import _integration
+
+_integration.load()
+
+from renogy_modbus.const import DEVICE_TYPES  # noqa: E402
+from renogy_modbus.coordinator import RenogyCoordinator  # noqa: E402
+from renogy_modbus.modbus_client import RenogyModbusClient, RenogyModbusConnection  # noqa: E402
+
+# Sleep used by the event-loop lag probe (seconds)
+LAG_PROBE_INTERVAL = 0.01
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"mean": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 3)
+
+    return {
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": pick(50),
+        "p95": pick(95),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def device_profiles(count: int) -> dict[int, str]:
+    """Alternate batteries and chargers on slave ids 1..count."""
+    return {
+        slave: "smart_battery" if slave % 2 else "dc_to_dc"
+        for slave in range(1, count + 1)
+    }
+
+
+# ============================================================
+#  EMULATOR PROCESS
+# ============================================================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_emulator(devices: dict[int, str], port: int, args) -> subprocess.Popen:
+    battery = ",".join(str(s) for s, p in devices.items() if p == "smart_battery")
+    charger = ",".join(str(s) for s, p in devices.items() if p == "dc_to_dc")
+    proc = subprocess.Popen(
+        [
+            sys.executable, str(_integration.ROOT / "tools" / "emulator.py"),
+            "--port", str(port),
+            "--battery", battery,
+            "--charger", charger,
+            "--latency", str(args.latency),
+            "--jitter", str(args.jitter),
+            "--speed", "60",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return proc
+        except OSError:
+            await asyncio.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("emulator did not start")
+
+
+# ============================================================
+#  SCENARIO
+# ============================================================
+
+class LagProbe:
+    """Measures how late the event loop wakes up a sleeping task."""
+
+    def __init__(self):
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            self.samples.append((time.perf_counter() - started - LAG_PROBE_INTERVAL) * 1000)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def poll(coordinator, interval: float, stop_at: float, cycles: list, failures: list):
+    """Drive one coordinator at a fixed interval, the way Home Assistant would."""
+    while time.monotonic() < stop_at:
+        started = time.monotonic()
+        try:
+            coordinator.data = await coordinator._async_update_data()
+            cycles.append((time.monotonic() - started) * 1000)
+        except Exception:  # noqa: BLE001 - a failed update is a data point
+            failures.append(1)
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+async def run_scenario(count: int, interval: float, args) -> dict:
+    devices = device_profiles(count)
+    port = free_port()
+    emulator = await start_emulator(devices, port, args)
+
+    connection = RenogyModbusConnection(
+        "127.0.0.1", port, pipeline_depth=args.pipeline_depth
+    )
+    coordinators = []
+    for slave, profile in devices.items():
+        client = RenogyModbusClient("127.0.0.1", port, slave, connection=connection)
+        coordinators.append(
+            RenogyCoordinator(
+                None,
+                client,
+                DEVICE_TYPES[profile],
+                f"{profile}_{slave}",
+                update_interval=interval,
+                min_interval=interval,
+                max_interval=interval,
+            )
+        )
+
+    try:
+        await connection.connect()
+
+        # Warm-up: static/slow tiers, connection setup
+        for coordinator in coordinators:
+            coordinator.data = await coordinator._async_update_data()
+
+        # ------------------------------------------------------------
+        # Timing pass
+        # ------------------------------------------------------------
+        cycles: list[float] = []
+        failures: list[int] = []
+
+        # CPU the lag probe burns on its own, subtracted from the update cost
+        idle = LagProbe()
+        idle_started, idle_cpu = time.monotonic(), time.process_time()
+        idle.start()
+        await asyncio.sleep(min(2.0, args.duration / 4))
+        await idle.stop()
+        probe_cpu_rate = (time.process_time() - idle_cpu) / (time.monotonic() - idle_started)
+
+        lag = LagProbe()
+        requests_before = connection.scheduler.stats()["requests"]
+        cpu_before = time.process_time()
+
+        lag.start()
+        stop_at = time.monotonic() + args.duration
+        await asyncio.gather(
+            *(poll(c, interval, stop_at, cycles, failures) for c in coordinators)
+        )
+        await lag.stop()
+
+        cpu = max(0.0, time.process_time() - cpu_before - probe_cpu_rate * args.duration)
+        requests = connection.scheduler.stats()["requests"] - requests_before
+        updates = len(cycles) + len(failures)
+        utilisation = connection.scheduler.utilisation
+
+        # ------------------------------------------------------------
+        # Allocation pass (tracemalloc slows everything down, so separate)
+        # ------------------------------------------------------------
+        tracemalloc.start()
+        peaks = []
+        before = tracemalloc.take_snapshot()
+        for _ in range(args.alloc_updates):
+            for coordinator in coordinators:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                coordinator.data = await coordinator._async_update_data()
+                peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        alloc_updates = args.alloc_updates * len(coordinators)
+        net = after.compare_to(before, "filename")
+        net_blocks = sum(stat.count_diff for stat in net)
+        net_bytes = sum(stat.size_diff for stat in net)
+
+    finally:
+        await connection.close()
+        emulator.terminate()
+        emulator.wait()
+
+    return {
+        "devices": count,
+        "interval": interval,
+        "updates": updates,
+        "failed_updates": len(failures),
+        "requests_per_update": round(requests / updates, 3) if updates else None,
+        "update_ms": percentiles(cycles),
+        "cpu_ms_per_update": round(cpu * 1000 / updates, 3) if updates else None,
+        "alloc_peak_bytes_per_update": percentiles(peaks),
+        "alloc_net_blocks_per_update": round(net_blocks / alloc_updates, 2) if alloc_updates else None,
+        "alloc_net_bytes_per_update": round(net_bytes / alloc_updates, 1) if alloc_updates else None,
+        "loop_lag_ms": percentiles(lag.samples),
+        "bus_utilisation": round(utilisation, 4),
+    }
+
+
+async def run(args) -> dict:
+    results = []
+    for count in args.devices:
+        for interval in args.intervals:
+            print(f"benchmark: {count} devices, {interval} s interval", file=sys.stderr)
+            results.append(await run_scenario(count, interval, args))
+
+    return {
+        "revision": _integration.git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "duration": args.duration,
+            "latency_ms": args.latency,
+            "jitter_ms": args.jitter,
+            "pipeline_depth": args.pipeline_depth,
+            "alloc_updates": args.alloc_updates,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Renogy polling pipeline")
+    parser.add_argument("--devices", default="1,10,50", help="device counts, comma separated")
+    parser.add_argument("--intervals", default="5", help="poll intervals (s), comma separated")
+    parser.add_argument("--duration", type=float, default=20, help="timing pass per scenario (s)")
+    parser.add_argument("--latency", type=float, default=0, help="emulated bus time per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="+- emulated latency (ms)")
+    parser.add_argument("--pipeline-depth", type=int, default=1)
+    parser.add_argument("--alloc-updates", type=int, default=5, help="updates per device in the allocation pass")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    args.devices = [int(x) for x in args.devices.split(",")]
+    args.intervals = [float(x) for x in args.intervals.split(",")]
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,671 @@
+"""
+Renogy device emulator.
+
+Serves the smart_battery and dc_to_dc register maps from const.py on a
+local Modbus TCP listener, using the vendored pymodbus server with one
+ModbusSimulatorContext per slave id. Register values come from simple
+physical models (current integrates into capacity, temperatures follow
+load, chargers move through their states), so the integration sees
+plausible, moving data.
+
+Each listener behaves like one RS485 gateway: requests are answered one
+at a time, with optional latency, jitter, dropped responses and Modbus
+exception responses.
+
+    python tools/emulator.py --battery 1-25 --charger 26-50 --latency 15 --jitter 5
+    python tools/emulator.py --charger 1 --drop 0.02 --exception 0.01 --exception-code 6
+
+The same pieces are importable (``Emulator``) for benchmarks and tests.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import struct
+import time
+from dataclasses import dataclass
+
+if __package__ in (None, ""):
+    import _integration
+else:
+    from . import _integration
+
+_integration.load()
+
+from pymodbus.constants import ExcCodes  # noqa: E402
+from pymodbus.datastore import ModbusServerContext, ModbusSimulatorContext  # noqa: E402
+from pymodbus.exceptions import NoSuchIdException  # noqa: E402
+from pymodbus.server import ModbusTcpServer  # noqa: E402
+
+from renogy_modbus.const import DEVICE_TYPES  # noqa: E402
+from renogy_modbus.planner import TYPE_FORMATS, register_count  # noqa: E402
+
+_LOGGER = logging.getLogger("renogy_emulator")
+
+# Registers closer than this are served from one contiguous cell range,
+# so block reads spanning small gaps succeed like on the real devices
+REGION_SLACK = 32
+
+# Registers the emulated devices accept writes on
+WRITABLE_KEYS = {"set_current_raw"}
+
+
+# ============================================================
+#  FAULT INJECTION / BUS TIMING
+# ============================================================
+
+@dataclass
+class Faults:
+    """Per-listener timing and fault settings (times in seconds)."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    drop: float = 0.0
+    exception: float = 0.0
+    exception_code: int = ExcCodes.DEVICE_BUSY
+
+
+class EmulatedBus:
+    """
+    One RS485 bus behind a gateway: a single request at a time.
+
+    Every request holds the bus for latency +- jitter; it may then be
+    dropped (no response, the client times out) or answered with an
+    exception code instead of data.
+    """
+
+    def __init__(self, faults: Faults, rng: random.Random):
+        self.faults = faults
+        self._rng = rng
+        self._lock = asyncio.Lock()
+        self.requests = 0
+        self.dropped = 0
+        self.exceptions = 0
+
+    async def transact(self) -> ExcCodes | None:
+        """Occupy the bus for one request; return an exception code to inject."""
+        faults = self.faults
+        async with self._lock:
+            self.requests += 1
+            delay = faults.latency
+            if faults.jitter:
+                delay += self._rng.uniform(-faults.jitter, faults.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if faults.drop and self._rng.random() < faults.drop:
+            self.dropped += 1
+            raise NoSuchIdException("response dropped by emulator")
+        if faults.exception and self._rng.random() < faults.exception:
+            self.exceptions += 1
+            return ExcCodes(faults.exception_code)
+        return None
+
+
+# ============================================================
+#  DEVICE MODELS
+# ============================================================
+
+class BatteryModel:
+    """
+    Smart lithium battery (4S LiFePO4).
+
+    Alternates between idle, charging and discharging phases. Current
+    follows the phase target with some lag and noise, capacity integrates
+    current, voltage follows state of charge and load, cell temperatures
+    follow ambient plus I^2 heating, cycles count full-capacity throughput.
+    """
+
+    profile = "smart_battery"
+
+    def __init__(self, slave: int, rng: random.Random):
+        self.rng = rng
+        self.max_ah = rng.choice((100.0, 100.0, 200.0, 300.0))
+        self.capacity = self.max_ah * rng.uniform(0.3, 0.9)
+        self.cycles = rng.randint(5, 400)
+        self.throughput = 0.0
+
+        self.current = 0.0
+        self.phase = "idle"
+        self.target = 0.0
+        self.phase_left = rng.uniform(10, 120)
+
+        self.ambient = rng.uniform(12, 30)
+        self.offsets = [rng.uniform(-0.6, 0.6) for _ in range(4)]
+        self.cells = [self.ambient + o for o in self.offsets]
+        # Cell imbalance (V), drifting slowly
+        self.balance = [rng.uniform(-0.08, 0.08) for _ in range(4)]
+
+    def _next_phase(self, soc: float):
+        rng = self.rng
+        if soc < 0.2:
+            phase = "charging"
+        elif soc > 0.97:
+            phase = rng.choice(("idle", "discharging"))
+        else:
+            phase = rng.choice(("idle", "charging", "discharging", "discharging"))
+
+        self.phase = phase
+        if phase == "charging":
+            self.target = rng.uniform(5, 0.4 * self.max_ah)
+            self.phase_left = rng.uniform(600, 3600)
+        elif phase == "discharging":
+            self.target = -rng.uniform(2, 0.3 * self.max_ah)
+            self.phase_left = rng.uniform(600, 3600)
+        else:
+            self.target = 0.0
+            self.phase_left = rng.uniform(60, 900)
+
+    def step(self, dt: float):
+        soc = self.capacity / self.max_ah
+        self.phase_left -= dt
+        if (
+            self.phase_left <= 0
+            or (self.phase == "charging" and soc >= 0.995)
+            or (self.phase == "discharging" and soc <= 0.12)
+        ):
+            self._next_phase(soc)
+
+        target = self.target
+        if self.phase == "charging" and soc > 0.9:
+            # constant-voltage taper near full
+            target *= max(0.05, (1.0 - soc) * 10)
+
+        lag = min(1.0, dt / 5)
+        self.current += (target - self.current) * lag + self.rng.gauss(0, 0.03)
+        if self.phase == "idle" and abs(self.current) < 0.05:
+            self.current = 0.0
+
+        delta = self.current * dt / 3600
+        self.capacity = min(self.max_ah, max(0.0, self.capacity + delta))
+        if delta < 0:
+            self.throughput -= delta
+            if self.throughput >= self.max_ah:
+                self.throughput -= self.max_ah
+                self.cycles += 1
+
+        heat = self.current ** 2 * 0.0015
+        follow = min(1.0, dt / 300)
+        for i, offset in enumerate(self.offsets):
+            self.cells[i] += (self.ambient + offset + heat - self.cells[i]) * follow
+        for i in range(len(self.balance)):
+            self.balance[i] = max(-0.15, min(0.15, self.balance[i] + self.rng.gauss(0, 0.0005 * dt)))
+
+    def values(self) -> dict:
+        soc = self.capacity / self.max_ah
+        # 4S LiFePO4: flat plateau with knees at both ends, plus IR drop
+        ocv = 12.0 + 1.2 * soc + 0.4 * soc ** 8 - 0.6 * (1 - soc) ** 12
+        cap_raw = round(self.capacity / 0.002)
+        max_raw = round(self.max_ah / 0.002)
+        voltage = ocv + self.current * 0.004
+        return {
+            "current": self.current,
+            "voltage": voltage,
+            "cap_reg1": cap_raw // 32768,
+            "cap_reg2": (cap_raw % 32768) * 2,
+            "maxcap_reg1": max_raw // 32768,
+            "maxcap_reg2": (max_raw % 32768) * 2,
+            "cycles": self.cycles,
+            "cell_count": len(self.balance),
+            "cell_voltage": [voltage / len(self.balance) + b for b in self.balance],
+            "cell_temperature_count": len(self.cells),
+            "cell_temperature": list(self.cells),
+        }
+
+    def write(self, key: str, raw: int):
+        """Batteries expose no writable registers."""
+
+
+class ChargerModel:
+    """
+    DC-DC charger with alternator and solar (hookup) inputs.
+
+    The engine runs in random stints; solar follows a daily sine with
+    passing clouds. Output is limited by the set charge current (writable
+    at 0xE001), the charger state follows inputs and battery SOC, and
+    alarms are raised for over-temperature and a flat house battery.
+    """
+
+    profile = "dc_to_dc"
+
+    RATED_VOLTAGE = 12
+    RATED_CURRENT = 50
+    DAY = 86400.0
+
+    def __init__(self, slave: int, rng: random.Random):
+        self.rng = rng
+        self.slave = slave
+        self.clock = rng.uniform(0, self.DAY)
+        self.set_current = 40.0
+
+        self.soc = rng.uniform(0.3, 0.9)
+        self.batt_ah = 200.0
+        self.engine = rng.random() < 0.3
+        self.engine_left = rng.uniform(300, 3600)
+        self.cloud = 1.0
+
+        self.ambient = rng.uniform(10, 30)
+        self.internal = self.ambient
+        self.energy_today = 0.0
+        self.energy_total = rng.uniform(10_000, 2_000_000)
+        self.alarm_a = 0
+        self.alarm_b = 0
+
+        self.alt_v = self.alt_i = self.pv_v = self.pv_i = 0.0
+        self.batt_v = 12.8
+        self.batt_i = 0.0
+        self.state = 0
+
+        self.serial = 0x20000000 + slave
+        self.software = 0x00010203
+        self.hardware = 0x00010000
+
+    def step(self, dt: float):
+        rng = self.rng
+
+        day_before = int(self.clock // self.DAY)
+        self.clock += dt
+        if int(self.clock // self.DAY) != day_before:
+            self.energy_today = 0.0
+
+        self.engine_left -= dt
+        if self.engine_left <= 0:
+            self.engine = not self.engine
+            self.engine_left = rng.uniform(600, 7200) if self.engine else rng.uniform(1800, 14400)
+
+        # Inputs
+        if self.engine:
+            self.alt_v = 13.9 + rng.gauss(0, 0.05)
+            alt_avail = 700.0
+        else:
+            self.alt_v = 12.6 + rng.gauss(0, 0.02)  # resting starter battery
+            alt_avail = 0.0
+
+        self.cloud += (rng.uniform(0.3, 1.0) - self.cloud) * min(1.0, dt / 120)
+        sun = max(0.0, math.sin(2 * math.pi * (self.clock % self.DAY) / self.DAY - math.pi / 2))
+        pv_avail = 400.0 * sun * self.cloud
+        self.pv_v = 18.0 + 3.0 * sun + rng.gauss(0, 0.05) if sun > 0.02 else 10.0 * sun
+
+        # Battery side
+        self.batt_v = 12.0 + 1.2 * self.soc + 0.4 * self.soc ** 8
+        limit = min(self.set_current, self.RATED_CURRENT)
+        if self.soc >= 0.98:
+            limit = min(limit, 1.0)
+
+        wanted = (alt_avail + pv_avail) * 0.95 / max(self.batt_v, 1.0)
+        self.batt_i = min(wanted, limit)
+        used = self.batt_i * self.batt_v / 0.95
+        pv_used = min(pv_avail, used)
+        alt_used = used - pv_used
+        self.pv_i = pv_used / self.pv_v if self.pv_v > 1 else 0.0
+        self.alt_i = alt_used / self.alt_v if alt_used > 0 and self.alt_v > 1 else 0.0
+
+        # House load drains the battery slowly
+        load = rng.uniform(1.0, 6.0)
+        self.soc += (self.batt_i - load) * dt / 3600 / self.batt_ah
+        self.soc = min(1.0, max(0.0, self.soc))
+
+        wh = self.batt_i * self.batt_v * dt / 3600
+        self.energy_today += wh
+        self.energy_total += wh
+
+        # State
+        if self.batt_i <= 0.05:
+            self.state = 0
+        elif self.soc >= 0.98:
+            self.state = 5
+        elif wanted > limit:
+            self.state = 6
+        elif alt_used > pv_used:
+            self.state = 4 if self.soc < 0.9 else 8
+        else:
+            self.state = 2
+
+        # Temperatures and alarms
+        loss = used * 0.05
+        self.internal += (self.ambient + loss * 0.6 - self.internal) * min(1.0, dt / 240)
+        self.alarm_a = (1 << 4) if self.internal > 75 else 0
+        self.alarm_b = (1 << 1) if self.soc < 0.05 else 0
+        if rng.random() < 0.0005 * dt:
+            self.alarm_b |= 1 << 6  # brief battery over-temp blip
+
+    def values(self) -> dict:
+        return {
+            "modbus_address": self.slave,
+            "rated_voltage_raw": self.RATED_VOLTAGE * 256 + self.RATED_CURRENT,
+            "set_current_raw": round(self.set_current * 100),
+            "serial_raw": self.serial,
+            "software_raw": self.software,
+            "hardware_raw": self.hardware,
+            "batt_soc_raw": round(self.soc * 100),
+            "batt_voltage_raw": round(self.batt_v * 10),
+            "batt_current_raw": round(self.batt_i * 100),
+            "temp_packed_raw": (round(self.internal) & 0xFF) * 256 + (round(self.ambient) & 0xFF),
+            "alt_voltage_raw": round(self.alt_v * 10),
+            "alt_current_raw": round(self.alt_i * 100),
+            "alt_power_raw": round(self.alt_i * self.alt_v),
+            "pv_voltage_raw": round(self.pv_v * 10),
+            "pv_current_raw": round(self.pv_i * 100),
+            "energy_today_raw": round(self.energy_today) & 0xFFFF,
+            "energy_total_raw": round(self.energy_total) & 0xFFFFFFFF,
+            "state_raw": self.state,
+            "alarm_a_raw": self.alarm_a,
+            "alarm_b_raw": self.alarm_b,
+        }
+
+    def write(self, key: str, raw: int):
+        if key == "set_current_raw":
+            self.set_current = raw / 100
+
+
+MODELS = {model.profile: model for model in (BatteryModel, ChargerModel)}
+
+
+# ============================================================
+#  DATASTORE
+# ============================================================
+
+def encode(spec: dict, value) -> list[int]:
+    """Scaled value -> register words, the inverse of planner.ReadBlock.decode."""
+    if "array" in spec:
+        # Elements past the given values read as 0, like unfitted cells
+        element = {k: v for k, v in spec.items() if k != "array"}
+        words = [word for item in value[: spec["array"]["count"]] for word in encode(element, item)]
+        return words + [0] * (register_count(spec) - len(words))
+
+    raw = round(value / spec.get("scale", 1))
+    fmt = TYPE_FORMATS.get(spec.get("type"), "H")
+    if fmt in "hi":
+        limit = 1 << (16 * register_count(spec) - 1)
+        raw = max(-limit, min(limit - 1, raw))
+    else:
+        raw = max(0, min((1 << (16 * register_count(spec))) - 1, raw))
+    words = list(struct.unpack(f">{register_count(spec)}H", struct.pack(f">{fmt}", raw)))
+    if spec.get("word_order") == "little":
+        words.reverse()
+    return words
+
+
+class RenogyDeviceContext(ModbusSimulatorContext):
+    """
+    Simulator datastore for one emulated device.
+
+    The register map is compacted: clusters of used registers become
+    contiguous cell ranges, anything outside them is an illegal address.
+    The model is advanced on every request (``speed`` x wall time).
+    """
+
+    def __init__(self, model, bus: EmulatedBus, speed: float = 1.0):
+        self.model = model
+        self.bus = bus
+        self.speed = speed
+
+        specs = DEVICE_TYPES[model.profile]["sensors"]
+        self._specs = {s["key"]: s for s in specs}
+
+        # (first register, end register, first cell)
+        self._regions: list[tuple[int, int, int]] = []
+        size = 0
+        for start, end in self._clusters(specs):
+            self._regions.append((start, end, size))
+            size += end - start
+
+        self._cells = {s["key"]: self._cell(s["register"]) for s in specs}
+        self._writable = {
+            self._cells[key]: key for key in WRITABLE_KEYS if key in self._cells
+        }
+
+        super().__init__(
+            {
+                "setup": {
+                    "co size": 0,
+                    "di size": 0,
+                    "hr size": size,
+                    "ir size": 0,
+                    "shared blocks": True,
+                    "type exception": False,
+                    "defaults": {
+                        "value": {"bits": 0, "uint16": 0, "uint32": 0, "float32": 0.0, "string": " "},
+                        "action": {"bits": None, "uint16": None, "uint32": None, "float32": None, "string": None},
+                    },
+                },
+                "invalid": [],
+                "write": [[cell, cell] for cell in self._writable],
+                "bits": [],
+                "uint16": [[0, size - 1]],
+                "uint32": [],
+                "float32": [],
+                "string": [],
+                "repeat": [],
+            },
+            None,
+        )
+
+        self._last = time.monotonic()
+        self._publish()
+
+    @staticmethod
+    def _clusters(specs):
+        spans = sorted((s["register"], s["register"] + register_count(s)) for s in specs)
+        clusters = [list(spans[0])]
+        for start, end in spans[1:]:
+            if start <= clusters[-1][1] + REGION_SLACK:
+                clusters[-1][1] = max(clusters[-1][1], end)
+            else:
+                clusters.append([start, end])
+        return clusters
+
+    def _cell(self, address: int, count: int = 1) -> int | None:
+        for start, end, first in self._regions:
+            if start <= address and address + count <= end:
+                return first + address - start
+        return None
+
+    def _publish(self):
+        """Advance the model to now and write its values into the cells."""
+        now = time.monotonic()
+        dt = (now - self._last) * self.speed
+        self._last = now
+        # Long gaps are simulated in steps so the dynamics stay stable
+        while dt > 0:
+            step = min(dt, 10.0)
+            self.model.step(step)
+            dt -= step
+
+        for key, value in self.model.values().items():
+            spec = self._specs.get(key)
+            if spec is None:
+                continue
+            for i, word in enumerate(encode(spec, value)):
+                self.registers[self._cells[key] + i].value = word
+
+    # ------------------------------------------------------------
+    # Datastore interface (Modbus addresses -> compact cells)
+    # ------------------------------------------------------------
+    def getValues(self, func_code, address, count=1):
+        cell = self._cell(address, count)
+        if cell is None:
+            return ExcCodes.ILLEGAL_ADDRESS
+        self._publish()
+        return super().getValues(func_code, cell, count)
+
+    def setValues(self, func_code, address, values):
+        cell = self._cell(address, len(values))
+        if cell is None:
+            return ExcCodes.ILLEGAL_ADDRESS
+        rc = super().setValues(func_code, cell, values)
+        if rc is None:
+            for i, value in enumerate(values):
+                key = self._writable.get(cell + i)
+                if key:
+                    self.model.write(key, value)
+        return rc
+
+    async def async_getValues(self, func_code, address, count=1):
+        injected = await self.bus.transact()
+        return injected if injected is not None else self.getValues(func_code, address, count)
+
+    async def async_setValues(self, func_code, address, values):
+        injected = await self.bus.transact()
+        return injected if injected is not None else self.setValues(func_code, address, values)
+
+
+# ============================================================
+#  EMULATOR
+# ============================================================
+
+class Emulator:
+    """
+    One or more emulated gateways with their devices.
+
+    ``devices`` maps slave id -> profile name ("smart_battery" / "dc_to_dc").
+    Gateway N listens on ``port + N``; every gateway serves the same set of
+    slave ids with its own device models and bus.
+    """
+
+    def __init__(
+        self,
+        devices: dict[int, str],
+        host: str = "127.0.0.1",
+        port: int = 5020,
+        gateways: int = 1,
+        faults: Faults | None = None,
+        speed: float = 1.0,
+        seed: int = 0,
+    ):
+        self.devices = devices
+        self.host = host
+        self.port = port
+        self.gateways = gateways
+        self.faults = faults or Faults()
+        self.speed = speed
+        self.seed = seed
+
+        self.buses: list[EmulatedBus] = []
+        self.contexts: list[dict[int, RenogyDeviceContext]] = []
+        self._servers: list[ModbusTcpServer] = []
+
+    @property
+    def ports(self) -> list[int]:
+        return [self.port + i for i in range(self.gateways)]
+
+    async def start(self):
+        for index, port in enumerate(self.ports):
+            rng = random.Random(self.seed * 1000 + index)
+            bus = EmulatedBus(self.faults, rng)
+            contexts = {
+                slave: RenogyDeviceContext(
+                    MODELS[profile](slave, random.Random(f"{self.seed}:{index}:{slave}")),
+                    bus,
+                    self.speed,
+                )
+                for slave, profile in self.devices.items()
+            }
+            # Unknown slave ids (and dropped responses) time out like on RS485
+            server = ModbusTcpServer(
+                ModbusServerContext(devices=contexts, single=False),
+                address=(self.host, port),
+                ignore_missing_devices=True,
+            )
+            await server.serve_forever(background=True)
+
+            self.buses.append(bus)
+            self.contexts.append(contexts)
+            self._servers.append(server)
+            _LOGGER.info(
+                "Gateway %s:%s serving %d devices", self.host, port, len(contexts)
+            )
+
+    async def stop(self):
+        for server in self._servers:
+            await server.shutdown()
+        self._servers.clear()
+
+    def stats(self) -> list[dict]:
+        return [
+            {"port": port, "requests": bus.requests, "dropped": bus.dropped, "exceptions": bus.exceptions}
+            for port, bus in zip(self.ports, self.buses)
+        ]
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+# ============================================================
+#  COMMAND LINE
+# ============================================================
+
+def build_devices(battery: str, charger: str) -> dict[int, str]:
+    devices = {slave: "smart_battery" for slave in _integration.parse_ids(battery)}
+    for slave in _integration.parse_ids(charger):
+        if slave in devices:
+            raise SystemExit(f"slave id {slave} given as both battery and charger")
+        devices[slave] = "dc_to_dc"
+    if not devices:
+        raise SystemExit("no devices, use --battery and/or --charger")
+    return devices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate Renogy devices behind Modbus TCP gateways")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020, help="first listener port")
+    parser.add_argument("--gateways", type=int, default=1, help="listeners on consecutive ports")
+    parser.add_argument("--battery", default="", help="slave ids of smart batteries, e.g. 1-10,12")
+    parser.add_argument("--charger", default="", help="slave ids of DC-DC chargers")
+    parser.add_argument("--latency", type=float, default=0.0, help="bus time per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+- random latency (ms)")
+    parser.add_argument("--drop", type=float, default=0.0, help="fraction of requests left unanswered")
+    parser.add_argument("--exception", type=float, default=0.0, help="fraction answered with an exception")
+    parser.add_argument(
+        "--exception-code", type=int, default=int(ExcCodes.DEVICE_BUSY),
+        choices=[int(code) for code in ExcCodes],
+    )
+    parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per wall-clock second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+    emulator = Emulator(
+        build_devices(args.battery, args.charger),
+        host=args.host,
+        port=args.port,
+        gateways=args.gateways,
+        faults=Faults(
+            latency=args.latency / 1000,
+            jitter=args.jitter / 1000,
+            drop=args.drop,
+            exception=args.exception,
+            exception_code=args.exception_code,
+        ),
+        speed=args.speed,
+        seed=args.seed,
+    )
+
+    async def run():
+        async with emulator:
+            try:
+                await asyncio.Event().wait()
+            finally:
+                _LOGGER.info("Bus statistics: %s", emulator.stats())
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
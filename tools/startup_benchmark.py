@@ -0,0 +1,201 @@
+"""
+Integration startup benchmark.
+
+Measures what importing the integration's modules costs at Home
+Assistant boot: import wall time, resident memory added, the modules
+loaded (in particular how much of the vendored pymodbus) and the slowest
+imports from ``python -X importtime``. Every run is a fresh interpreter:
+
+    python tools/startup_benchmark.py
+    python tools/startup_benchmark.py --runs 20 --output startup.json
+    python tools/startup_benchmark.py --modules renogy_modbus.modbus_client --no-preload
+
+Standard library modules Home Assistant has loaded long before it sets
+up integrations (asyncio, logging, ssl, ...) are imported before the
+measurement starts, so the figures only cover the integration; pass
+--no-preload for a cold interpreter. The default modules do not need
+Home Assistant installed.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from statistics import median
+
+if __package__ in (None, ""):
+    import _integration
+else:
+    from . import _integration
+
+DEFAULT_MODULES = (
+    "renogy_modbus.const",
+    "renogy_modbus.planner",
+    "renogy_modbus.formulas",
+    "renogy_modbus.connection_pool",
+    "renogy_modbus.modbus_client",
+    "renogy_modbus.trace",
+)
+
+# Already imported in a running Home Assistant
+PRELOAD = (
+    "array", "asyncio", "bisect", "concurrent.futures", "dataclasses", "datetime",
+    "enum", "importlib.util", "json", "logging", "select", "selectors", "socket",
+    "ssl", "struct", "typing",
+)
+
+VENDOR_PREFIX = f"{_integration.PACKAGE}.vendor.pymodbus"
+
+
+# ============================================================
+#  CHILD (one measurement in a fresh interpreter)
+# ============================================================
+
+def rss_kib() -> int | None:
+    """Current resident set size (Linux only)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as fh:
+            pages = int(fh.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def child(settings: dict):
+    _integration.load()
+    for name in settings["preload"]:
+        importlib.import_module(name)
+
+    rss_before = rss_kib()
+    modules_before = set(sys.modules)
+    started = time.perf_counter()
+    for name in settings["modules"]:
+        importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    rss_after = rss_kib()
+
+    # lazily imported modules that were never used are not loaded
+    loaded = sorted(
+        name for name in set(sys.modules) - modules_before
+        if type(sys.modules[name]).__name__ != "_LazyModule"
+    )
+    print(json.dumps({
+        "import_ms": elapsed * 1000,
+        "rss_kib": rss_after - rss_before if rss_before is not None else None,
+        "modules": loaded,
+    }))
+
+
+# ============================================================
+#  PARENT
+# ============================================================
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """Map module -> (self us, cumulative us) from -X importtime output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def measure(settings: dict) -> tuple[dict, dict[str, tuple[int, int]]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", __file__, "--child", json.dumps(settings)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout), parse_importtime(proc.stderr)
+
+
+def summary(values: list[float]) -> dict:
+    if not values:
+        return {"median": None, "min": None, "max": None}
+    return {
+        "median": round(median(values), 2),
+        "min": round(min(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def run(args) -> dict:
+    settings = {
+        "modules": args.modules,
+        "preload": [] if args.no_preload else list(PRELOAD),
+    }
+
+    runs = []
+    importtimes: dict[str, list[tuple[int, int]]] = {}
+    for _ in range(args.runs):
+        result, times = measure(settings)
+        runs.append(result)
+        for name, value in times.items():
+            if name.startswith(_integration.PACKAGE):
+                importtimes.setdefault(name, []).append(value)
+
+    modules = runs[-1]["modules"]
+    slowest = sorted(
+        (
+            {
+                "module": name,
+                "self_ms": round(median(v[0] for v in values) / 1000, 2),
+                "cumulative_ms": round(median(v[1] for v in values) / 1000, 2),
+            }
+            for name, values in importtimes.items()
+        ),
+        key=lambda item: item["self_ms"],
+        reverse=True,
+    )[: args.top]
+
+    return {
+        "revision": _integration.git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {**settings, "runs": args.runs},
+        "results": {
+            "import_ms": summary([r["import_ms"] for r in runs]),
+            "rss_kib": summary([r["rss_kib"] for r in runs if r["rss_kib"] is not None]),
+            "modules_loaded": len(modules),
+            "pymodbus_modules": [
+                m.split(".vendor.", 1)[1] for m in modules if m.startswith(VENDOR_PREFIX)
+            ],
+            "slowest_imports": slowest,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Renogy integration's import cost")
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES), help="modules to import, comma separated")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--no-preload", action="store_true", help="do not preload what Home Assistant already imported")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(json.loads(args.child))
+        return
+
+    args.modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()